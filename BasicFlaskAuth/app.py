@@ -1,15 +1,25 @@
+import os
 from flask import Flask, request, abort
 import json
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from jwks import JWKSKeyStore
+from tokens import MAX_CACHED_TOKENS, TOKEN_CACHE_TTL, TokenCache
 
 
 app = Flask(__name__)
 
-AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'YOUR_DOMAIN.auth0.com')
 ALGORITHMS = ['RS256']
-API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
+API_AUDIENCE = os.environ.get('API_AUDIENCE', 'YOUR_API_AUDIENCE')
+
+# Cached between requests; see jwks.py.
+jwks = JWKSKeyStore(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+# Payloads of verified tokens; TOKEN_CACHE_SIZE=0 turns it off.
+token_cache = TokenCache(
+    max_size=int(os.environ.get('TOKEN_CACHE_SIZE', MAX_CACHED_TOKENS)),
+    ttl=int(os.environ.get('TOKEN_CACHE_TTL', TOKEN_CACHE_TTL)))
 
 
 class AuthError(Exception):
@@ -29,7 +39,7 @@ def get_token_auth_header():
         }, 401)
 
     parts = auth.split()
-    if parts[0].lower() != 'bearer':
+    if not parts or parts[0].lower() != 'bearer':
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization header must start with "Bearer".'
@@ -52,26 +62,28 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
+    try:
+        key = jwks.get(unverified_header['kid'])
+    except (OSError, ValueError, KeyError):
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 503)
+    if key:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }
         try:
             payload = jwt.decode(
                 token,
@@ -109,10 +121,13 @@ def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         token = get_token_auth_header()
-        try:
-            payload = verify_decode_jwt(token)
-        except:
-            abort(401)
+        payload = token_cache.get(token)
+        if payload is None:
+            try:
+                payload = verify_decode_jwt(token)
+            except:
+                abort(401)
+            token_cache.put(token, payload, payload.get('exp'))
         return f(payload, *args, **kwargs)
 
     return wrapper
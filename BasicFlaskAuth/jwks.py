@@ -0,0 +1,137 @@
+# Shared with BasicFlaskAuth. This file,
+# projects/03_coffee_shop_full_stack/starter_code/backend/src/auth/jwks.py,
+# is the canonical copy; BasicFlaskAuth/jwks.py must stay byte-identical
+# (the coffee shop's test_auth.py checks it).
+import json
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+DEFAULT_MAX_AGE = 10 * 60
+STALE_WHILE_REVALIDATE = 60 * 60
+MIN_REFETCH_INTERVAL = 30
+FETCH_TIMEOUT = 5
+
+_MAX_AGE = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+
+def max_age(cache_control):
+    '''The max-age of a Cache-Control header value in seconds, or None.'''
+    if not cache_control:
+        return None
+    if re.search(r'no-cache|no-store', cache_control, re.IGNORECASE):
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+def fetch_jwks(url, timeout=FETCH_TIMEOUT):
+    '''GET a JWKS document; return ({kid: jwk}, max-age in seconds).'''
+    with urlopen(url, timeout=timeout) as response:
+        jwks = json.loads(response.read())
+        age = max_age(response.headers.get('Cache-Control'))
+    return {key['kid']: key for key in jwks['keys'] if 'kid' in key}, age
+
+
+class JWKSKeyStore:
+    '''The signing keys of a JWKS endpoint, looked up by kid.
+
+    Keys are kept for the max-age the endpoint sends in Cache-Control
+    (`default_max_age` without one). For `stale_while_revalidate` seconds
+    after that they are still served while a background thread refetches
+    them; later than that a lookup waits for the refetch.
+
+    A kid that is not in the set forces a refetch, in case the keys were
+    rotated, but at most once every `min_refetch_interval` seconds. Only
+    one fetch runs at a time: concurrent lookups wait for it instead of
+    starting their own.
+    '''
+
+    def __init__(self, url, default_max_age=DEFAULT_MAX_AGE,
+                 stale_while_revalidate=STALE_WHILE_REVALIDATE,
+                 min_refetch_interval=MIN_REFETCH_INTERVAL,
+                 timeout=FETCH_TIMEOUT, clock=time.monotonic, fetch=None):
+        self.url = url
+        self.default_max_age = default_max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.clock = clock
+        self.fetch = fetch or fetch_jwks
+        self.fetches = 0
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._fresh_until = 0
+        self._lock = threading.Lock()
+        self._flight = None
+
+    def get(self, kid):
+        '''The JWK with this kid, or None. Raises if the keys cannot be
+        fetched and none are usable.'''
+        now = self.clock()
+        if self._fetched_at is None or \
+                now >= self._fresh_until + self.stale_while_revalidate:
+            self.refresh()
+        elif now >= self._fresh_until and self._may_refetch():
+            self.refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh(self.min_refetch_interval)
+            key = self._keys.get(kid)
+        return key
+
+    def refresh(self, min_interval=0):
+        '''Fetch the keys, or wait for the fetch that is already running.
+
+        Nothing is fetched if the last attempt was under `min_interval`
+        seconds ago.
+        '''
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                if not self._may_refetch(min_interval):
+                    return
+                flight = self._flight = threading.Event()
+                self._attempted_at = self.clock()
+        if not leader:
+            flight.wait(self.timeout)
+            if self._fetched_at is None:
+                raise OSError('Unable to fetch {}'.format(self.url))
+            return
+        try:
+            keys, age = self.fetch(self.url, timeout=self.timeout)
+            if age is None:
+                age = self.default_max_age
+            with self._lock:
+                self._keys = keys
+                self._fetched_at = self.clock()
+                self._fresh_until = self._fetched_at + age
+                self.fetches += 1
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
+
+    def _may_refetch(self, min_interval=None):
+        if min_interval is None:
+            min_interval = self.min_refetch_interval
+        return self._attempted_at is None or \
+            self.clock() - self._attempted_at >= min_interval
+
+    def refresh_in_background(self):
+        '''Start a refresh in a daemon thread unless one is running.'''
+        if self._flight is not None:
+            return
+        thread = threading.Thread(target=self._refresh_quietly, daemon=True)
+        thread.start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh(self.min_refetch_interval)
+        except Exception:
+            # Keep serving the stale keys; the next lookup tries again.
+            pass
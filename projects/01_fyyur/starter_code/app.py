@@ -3,18 +3,29 @@
 #----------------------------------------------------------------------------#
 
 import json
+import time
 from collections import defaultdict
+from functools import lru_cache
+from itertools import groupby
 import dateutil.parser
 from datetime import datetime
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
+from flask.cli import AppGroup
+from sqlalchemy import and_, case, event, func, literal, literal_column, or_, select, text, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from search import SearchIndex, prefix_tsquery
+from cache import cache_from_config
+from bulk import InvalidRow, chunked, coerce, file_format, read_rows, write_rows
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -25,6 +36,7 @@ app.config.from_object('config')
 db = SQLAlchemy(app)
 
 migrate = Migrate(app, db)
+cache = cache_from_config(app.config)
 
 # TODO: connect to a local postgresql database
 
@@ -33,6 +45,34 @@ migrate = Migrate(app, db)
 #----------------------------------------------------------------------------#
 
 
+# Genres are kept twice: comma-joined in the `genres` column for display and
+# search, and normalized in the association tables below for filtering.
+venue_genre = db.Table(
+    'venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'),
+              primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'),
+              primary_key=True),
+    db.Index('ix_venue_genre_genre_id', 'genre_id', 'venue_id'),
+)
+
+artist_genre = db.Table(
+    'artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'),
+              primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'),
+              primary_key=True),
+    db.Index('ix_artist_genre_genre_id', 'genre_id', 'artist_id'),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -48,7 +88,11 @@ class Venue(db.Model):
     genres = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # Maintained by the Show mapper events and refresh_upcoming_show_counters().
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0,
+                                   server_default='0')
     artists = db.relationship('Show', back_populates='venue', lazy='dynamic')
+    genre_tags = db.relationship('Genre', secondary=venue_genre)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
@@ -67,7 +111,11 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # Maintained by the Show mapper events and refresh_upcoming_show_counters().
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0,
+                                   server_default='0')
     venues = db.relationship('Show', back_populates='artist', lazy='dynamic')
+    genre_tags = db.relationship('Genre', secondary=artist_genre)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
@@ -76,6 +124,11 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time', 'show_id'),
+    )
 
     show_id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
@@ -86,18 +139,450 @@ class Show(db.Model):
     artist = db.relationship('Artist', back_populates="venues", lazy=True)
     venue = db.relationship('Venue', back_populates="artists", lazy=True)
 
+
+def _shift_upcoming_show_counters(connection, show, delta):
+  if show.start_time is None or show.start_time <= datetime.now():
+    return
+  for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    connection.execute(model.__table__.update().where(
+        model.id == owner_id
+    ).values(num_upcoming_shows=model.num_upcoming_shows + delta))
+
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+  _shift_upcoming_show_counters(connection, show, 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def uncount_deleted_show(mapper, connection, show):
+  _shift_upcoming_show_counters(connection, show, -1)
+
+
+def refresh_upcoming_show_counters(now=None, venue_ids=None, artist_ids=None):
+  '''Recount upcoming shows of venues and artists from the show table.
+
+  Inserts and deletes keep the counters current, but a show stops being
+  upcoming just by time passing, so this has to run on a schedule
+  (`flask fyyur refresh-counters`). Each counter is recomputed exactly,
+  which also repairs any drift. Pass lists of ids to only recount those
+  rows; an empty list skips that table.
+  '''
+  now = now or datetime.now()
+  for model, owner_column, ids in ((Venue, Show.venue_id, venue_ids),
+                                   (Artist, Show.artist_id, artist_ids)):
+    if ids is not None and not ids:
+      continue
+    upcoming = db.select([func.count(Show.show_id)]).where(and_(
+        owner_column == model.id, Show.start_time > now
+    )).as_scalar()
+    update = model.__table__.update().values(num_upcoming_shows=upcoming)
+    if ids is not None:
+      update = update.where(model.id.in_(ids))
+    db.session.execute(update)
+
+
+def set_genres(record, names):
+  '''Store genre `names` on a venue or artist, creating unknown genres.'''
+  names = list(dict.fromkeys(names))
+  known = {
+    genre.name: genre
+    for genre in Genre.query.filter(Genre.name.in_(names))
+  } if names else {}
+  record.genres = ",".join(names)
+  record.genre_tags = [known.get(name) or Genre(name=name) for name in names]
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+
+def _in_genre(query, model, genre):
+  '''Restrict a query on venues or artists to those tagged with `genre`.'''
+  owner = {Venue: venue_genre.c.venue_id, Artist: artist_genre.c.artist_id}[model]
+  return query.join(
+      owner.table, owner == model.id
+  ).join(
+      Genre, Genre.id == owner.table.c.genre_id
+  ).filter(Genre.name == genre)
+
+
+def venue_directory(genre=None):
+  '''Venues grouped by (city, state) with their number of upcoming shows.
+
+  Upcoming shows are read from the `num_upcoming_shows` counters, so this
+  is one query on the venue table. `genre` limits the directory to venues
+  tagged with that genre through the `venue_genre` index.
+  '''
+  query = db.session.query(
+      Venue.city,
+      Venue.state,
+      Venue.id,
+      Venue.name,
+      Venue.num_upcoming_shows,
+  )
+  if genre is not None:
+    query = _in_genre(query, Venue, genre)
+  rows = query.order_by(
+      Venue.state, Venue.city, Venue.id
+  ).all()
+  return [
+    {
+      "city": city,
+      "state": state,
+      "venues": [
+        {
+          "id": venue_id,
+          "name": name,
+          "num_upcoming_shows": num_upcoming_shows,
+        }
+        for _, _, venue_id, name, num_upcoming_shows in venues
+      ]
+    }
+    for (city, state), venues in groupby(rows, key=lambda row: row[:2])]
+
+
+def artist_directory(genre=None):
+  '''All artists, or those tagged with `genre`, ordered by name.'''
+  query = db.session.query(Artist.id, Artist.name)
+  if genre is not None:
+    query = _in_genre(query, Artist, genre)
+  return [
+    {
+      "id": artist_id,
+      "name": name,
+    }
+    for artist_id, name in query.order_by(Artist.name, Artist.id)
+  ]
+
+
+def _show_timeline(owner_column, owner_id, other, prefix, now=None,
+                   limit=None, past_page=1, upcoming_page=1):
+  '''Past and upcoming shows of one venue or artist in a single query.
+
+  Shows are joined with the `other` side of the booking and split on one
+  `now` cutoff inside the database: a window function numbers each section
+  (upcoming soonest first, past most recent first) and counts it, so
+  `limit` and the per-section pages are applied in SQL while the section
+  totals stay exact.
+  '''
+  now = now or datetime.now()
+  is_upcoming = Show.start_time > now
+  position = func.row_number().over(
+      partition_by=is_upcoming,
+      order_by=[case([(is_upcoming, Show.start_time)]).asc(),
+                Show.start_time.desc()],
+  ).label('position')
+  total = func.count(Show.show_id).over(partition_by=is_upcoming).label('total')
+  timeline = db.session.query(
+      other.id.label('id'),
+      other.name.label('name'),
+      other.image_link.label('image_link'),
+      Show.start_time.label('start_time'),
+      is_upcoming.label('upcoming'),
+      position,
+      total,
+  ).join(
+      other, other.id == getattr(Show, f'{prefix}_id')
+  ).filter(
+      owner_column == owner_id, Show.start_time.isnot(None)
+  ).subquery()
+
+  pages = {False: past_page, True: upcoming_page}
+
+  def page_bounds(upcoming):
+    offset = (max(pages[upcoming], 1) - 1) * limit
+    return offset, offset + limit
+
+  query = db.session.query(timeline)
+  if limit is not None:
+    # The first row of each section is always fetched so that its total is
+    # known even when the requested page lies past the end of the section.
+    query = query.filter(or_(timeline.c.position == 1, *(
+        and_(timeline.c.upcoming == upcoming,
+             timeline.c.position.between(first + 1, last))
+        for upcoming in (False, True)
+        for first, last in [page_bounds(upcoming)]
+    )))
+  rows = query.order_by(timeline.c.upcoming, timeline.c.position).all()
+
+  sections = {
+    False: {"shows": [], "count": 0},
+    True: {"shows": [], "count": 0},
+  }
+  for row in rows:
+    upcoming = bool(row.upcoming)
+    sections[upcoming]["count"] = row.total
+    if limit is not None:
+      first, last = page_bounds(upcoming)
+      if not first < row.position <= last:
+        continue
+    sections[upcoming]["shows"].append({
+      f"{prefix}_id": row.id,
+      f"{prefix}_name": row.name,
+      f"{prefix}_image_link": row.image_link,
+      "start_time": row.start_time,
+    })
+  return {
+    "past_shows": sections[False]["shows"],
+    "upcoming_shows": sections[True]["shows"],
+    "past_shows_count": sections[False]["count"],
+    "upcoming_shows_count": sections[True]["count"],
+  }
+
+
+def venue_timeline(venue_id, **kwargs):
+  '''Shows booked at a venue, keyed the way `show_venue.html` expects.'''
+  return _show_timeline(Show.venue_id, venue_id, Artist, 'artist', **kwargs)
+
+
+def artist_timeline(artist_id, **kwargs):
+  '''Shows played by an artist, keyed the way `show_artist.html` expects.'''
+  return _show_timeline(Show.artist_id, artist_id, Venue, 'venue', **kwargs)
+
+
+def venue_page(venue_id, **kwargs):
+  '''Everything `show_venue.html` renders, or None for an unknown venue.'''
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    return None
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": (venue.genres).split(","),
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "image_link": venue.image_link,
+    **venue_timeline(venue_id, **kwargs),
+  }
+
+
+def artist_page(artist_id, **kwargs):
+  '''Everything `show_artist.html` renders, or None for an unknown artist.'''
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    return None
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": artist.genres.split(','),
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    **artist_timeline(artist_id, **kwargs),
+  }
+
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+# In-process search indexes, built on first use when the database has no
+# full-text search (SQLite) and dropped whenever a venue or artist changes.
+_search_indexes = {}
+
+
+def invalidate_search_indexes(*args):
+  _search_indexes.clear()
+
+
+for model in (Venue, Artist):
+  for mapper_event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(model, mapper_event, invalidate_search_indexes)
+event.listen(Session, 'after_bulk_update', invalidate_search_indexes)
+event.listen(Session, 'after_bulk_delete', invalidate_search_indexes)
+
+
+def _database_search(model, search_term, offset, limit):
+  '''Ranked search on the `search_vector` column and trigram name index.'''
+  vector = literal_column(f'"{model.__tablename__}".search_vector')
+  matches = [model.name.ilike(f'%{search_term}%')]
+  rank = literal(0)
+  query = prefix_tsquery(search_term)
+  if query:
+    tsquery = func.to_tsquery('simple', query)
+    matches.append(vector.op('@@')(tsquery))
+    rank = func.ts_rank(vector, tsquery)
+  rows = db.session.query(
+      model.id, model.name, model.num_upcoming_shows, func.count().over()
+  ).filter(
+      or_(*matches)
+  ).order_by(
+      rank.desc(), model.name, model.id
+  ).offset(offset).limit(limit).all()
+  if rows:
+    return rows[0][3], [row[:3] for row in rows]
+  return db.session.query(model.id).filter(or_(*matches)).count(), []
+
+
+def _local_search(model, search_term, offset, limit):
+  '''Same ranking as `_database_search`, served from a `SearchIndex`.'''
+  index = _search_indexes.get(model)
+  if index is None:
+    index = SearchIndex()
+    for row in db.session.query(model.id, model.name, model.city, model.genres):
+      index.add(*row)
+    _search_indexes[model] = index
+  ranked = index.search(search_term)
+  page_ids = [doc_id for doc_id, _ in ranked[offset:offset + limit]]
+  rows = {
+    row[0]: row
+    for row in db.session.query(
+        model.id, model.name, model.num_upcoming_shows
+    ).filter(model.id.in_(page_ids))
+  } if page_ids else {}
+  return len(ranked), [rows[doc_id] for doc_id in page_ids]
+
+
+def _search(model, search_term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+  '''Ranked, prefix-aware search on name, city and genres.
+
+  Uses PostgreSQL full-text search when available and an in-process index
+  otherwise. Upcoming show counts come from the `num_upcoming_shows` counters.
+  '''
+  offset = (max(page, 1) - 1) * per_page
+  if db.engine.dialect.name == 'postgresql':
+    count, rows = _database_search(model, search_term, offset, per_page)
+  else:
+    count, rows = _local_search(model, search_term, offset, per_page)
+  return {
+    "count": count,
+    "data": [
+      {
+        "id": doc_id,
+        "name": name,
+        "num_upcoming_shows": num_upcoming_shows,
+      }
+      for doc_id, name, num_upcoming_shows in rows
+    ]
+  }
+
+
+def venue_search(search_term, **kwargs):
+  return _search(Venue, search_term, **kwargs)
+
+
+def artist_search(search_term, **kwargs):
+  return _search(Artist, search_term, **kwargs)
+
+
+SHOWS_PER_PAGE = 30
+
+
+def encode_show_cursor(start_time, show_id):
+  return f'{start_time.isoformat()},{show_id}'
+
+
+def decode_show_cursor(cursor):
+  '''Inverse of `encode_show_cursor`; raises ValueError on a malformed cursor.'''
+  start_time, show_id = cursor.rsplit(',', 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+
+def show_listing(after=None, when=None, start=None, end=None,
+                 limit=SHOWS_PER_PAGE, now=None):
+  '''One page of shows with their venue and artist, keyset-paginated.
+
+  Shows are ordered by `(start_time, show_id)`, most recent first for past
+  shows and soonest first otherwise, and `after` is the cursor of the last
+  show of the previous page. Only the requested page is read, so the cost
+  does not grow with the size of the `show` table. `when` may be
+  'upcoming' or 'past', and `start`/`end` bound the start time.
+
+  Returns the page and the cursor of the next page, or None on the last one.
+  '''
+  now = now or datetime.now()
+  key = tuple_(Show.start_time, Show.show_id)
+  descending = when == 'past'
+  query = db.session.query(
+      Show.show_id,
+      Show.start_time,
+      Venue.id,
+      Venue.name,
+      Artist.id,
+      Artist.name,
+      Artist.image_link,
+  ).join(
+      Venue, Venue.id == Show.venue_id
+  ).join(
+      Artist, Artist.id == Show.artist_id
+  ).filter(Show.start_time.isnot(None))
+  if when == 'upcoming':
+    query = query.filter(Show.start_time > now)
+  elif when == 'past':
+    query = query.filter(Show.start_time <= now)
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if after is not None:
+    after = tuple_(*after)
+    query = query.filter(key < after if descending else key > after)
+  if descending:
+    query = query.order_by(Show.start_time.desc(), Show.show_id.desc())
+  else:
+    query = query.order_by(Show.start_time, Show.show_id)
+  # One extra row tells whether there is a next page.
+  rows = query.limit(limit + 1).all()
+
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_show_cursor(rows[-1][1], rows[-1][0])
+  data = [
+    {
+      "venue_id": venue_id,
+      "venue_name": venue_name,
+      "artist_id": artist_id,
+      "artist_name": artist_name,
+      "artist_image_link": artist_image_link,
+      "start_time": start_time,
+    }
+    for (_, start_time, venue_id, venue_name, artist_id, artist_name,
+         artist_image_link) in rows
+  ]
+  return data, next_cursor
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format = "EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format = "EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  '''Babel pattern and parsed locale, built once per pair.'''
+  return DATETIME_FORMATS.get(format, format), babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=app.config.get('DATETIME_MEMO_SIZE', 4096))
+def _format_datetime(date, format, locale):
+  # Babel caches the parsed pattern and normalizes the timezone.
+  pattern, locale = datetime_pattern(format, locale)
+  return babel.dates.format_datetime(date, pattern, locale=locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+  # Views pass datetimes; strings are still accepted for older callers.
+  if isinstance(value, str):
+    try:
+      value = datetime.fromisoformat(value)
+    except ValueError:
+      value = dateutil.parser.parse(value)
+  return _format_datetime(value, format, locale or babel.dates.LC_TIME)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
@@ -107,6 +592,20 @@ app.jinja_env.filters['datetime'] = format_datetime
 #----------------------------------------------------------------------------#
 
 
+def cache_key(args):
+  '''Stable cache key fragment for a dict of view arguments.'''
+  return ':'.join(f'{k}={v}' for k, v in sorted(args.items()))
+
+
+def timeline_args():
+  '''Optional `limit`, `past_page` and `upcoming_page` query arguments.'''
+  return {
+    "limit": request.args.get('limit', type=int),
+    "past_page": request.args.get('past_page', 1, type=int),
+    "upcoming_page": request.args.get('upcoming_page', 1, type=int),
+  }
+
+
 @app.route('/')
 def index():
   return render_template('pages/home.html')
@@ -117,24 +616,15 @@ def index():
 
 @app.route('/venues')
 def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  venues = Venue.query.all()
-  cities_and_states = set([(venue.city, venue.state) for venue in venues])
-  data = [
-    {
-      "city": city,
-      "state": state,
-      "venues": [
-        {
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": venue.artists.count()
-        }
-        for venue in venues
-      ]
-    }
-    for city, state in cities_and_states]
+  data = cache.get_or_set('venues', 'directory', venue_directory)
+  return render_template('pages/venues.html', areas=data)
+
+
+@app.route('/genres/<genre>/venues')
+def venues_by_genre(genre):
+  Genre.query.filter_by(name=genre).first_or_404()
+  data = cache.get_or_set('venues', f'directory:{genre}',
+                          lambda: venue_directory(genre=genre))
   return render_template('pages/venues.html', areas=data)
 
 
@@ -144,57 +634,20 @@ def search_venues():
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  response = {
-    "count": len(venues),
-    "data": [
-      {
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": venue.artists.count()
-      }
-      for venue in venues
-    ]
-  }
-  # venues = db.session.query(Venue, show).outerjoin(Venue, )
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  response = venue_search(
+      search_term, page=request.form.get('page', 1, type=int))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  venue = Venue.query.get(venue_id)
-  past_shows = [{
-      "artist_id": show.artist.id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": str(show.start_time),
-  } for show in venue.artists if show.start_time < datetime.now()]
-  upcoming_shows = [{
-      "artist_id": show.artist.id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": str(show.start_time),
-  } for show in venue.artists if show.start_time > datetime.now()]
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": (venue.genres).split(","),
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "image_link": venue.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
-  # data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
+  args = timeline_args()
+  data = cache.get_or_set(
+      'venues', f'venue:{venue_id}:{cache_key(args)}',
+      lambda: venue_page(venue_id, **args))
+  if data is None:
+    abort(404)
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -223,12 +676,13 @@ def create_venue_submission():
             image_link=form.image_link.data,
             facebook_link=form.facebook_link.data,
             website=form.website.data,
-            genres=",".join(form.genres.data),
-            seeking_venue=form.seeking_venue.data,
+            seeking_talent=form.seeking_talent.data,
             seeking_description=form.seeking_description.data,
         )
+        set_genres(venue, form.genres.data)
         db.session.add(venue)
         db.session.commit()
+        cache.invalidate('venues')
         flash('Venue ' + form.name.data + ' was successfully listed!')
     except Exception as e:
         flash(f'An error occurred: {e}')
@@ -243,8 +697,15 @@ def delete_venue(venue_id):
     # TODO: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
     try:
+        artist_ids = [artist_id for artist_id, in db.session.query(
+            Show.artist_id).filter_by(venue_id=venue_id).distinct()]
+        Show.query.filter_by(venue_id=venue_id).delete()
+        db.session.execute(
+            venue_genre.delete().where(venue_genre.c.venue_id == venue_id))
         Venue.query.filter_by(id=venue_id).delete()
+        refresh_upcoming_show_counters(venue_ids=[], artist_ids=artist_ids)
         db.session.commit()
+        cache.invalidate('venues', 'artists', 'shows')
     except Exception as e:
         flash(f'An error occurred: {e}')
         db.session.rollback()
@@ -258,15 +719,15 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  artists = Artist.query.all()
-  data = [
-    {
-      "id": artist.id,
-      "name": artist.name
-    }
-    for artist in artists
-  ]
+  data = cache.get_or_set('artists', 'directory', artist_directory)
+  return render_template('pages/artists.html', artists=data)
+
+
+@app.route('/genres/<genre>/artists')
+def artists_by_genre(genre):
+  Genre.query.filter_by(name=genre).first_or_404()
+  data = cache.get_or_set('artists', f'directory:{genre}',
+                          lambda: artist_directory(genre=genre))
   return render_template('pages/artists.html', artists=data)
 
 
@@ -276,61 +737,20 @@ def search_artists():
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   search_term = request.form.get('search_term', '')
-  artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-  response = {
-    "count": len(artists),
-    "data": [
-      {
-        "id": artist.id,
-        "name": artist.name,
-        "num_upcoming_shows": artist.venues.count(),
-      }
-      for artist in artists
-    ]
-  }
+  response = artist_search(
+      search_term, page=request.form.get('page', 1, type=int))
   return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  artist = Artist.query.get(artist_id)
-  past_shows = [
-    {
-      "venue_id": show.venue.id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": str(show.start_time)
-    } 
-    for show in artist.venues if show.start_time < datetime.now()
-  ]
-  upcoming_shows = [
-    {
-      "venue_id": show.venue.id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": str(show.start_time)
-    } 
-    for show in artist.venues if show.start_time > datetime.now()
-  ]
-  data = {
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres.split(','),
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
+  # shows the artist page with the given artist_id
+  args = timeline_args()
+  data = cache.get_or_set(
+      'artists', f'artist:{artist_id}:{cache_key(args)}',
+      lambda: artist_page(artist_id, **args))
+  if data is None:
+    abort(404)
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -374,10 +794,11 @@ def edit_artist_submission(artist_id):
       artist.image_link = form.image_link.data
       artist.facebook_link = form.facebook_link.data
       artist.website = form.website.data
-      artist.genres = ",".join(form.genres.data)
+      set_genres(artist, form.genres.data)
       artist.seeking_venue = form.seeking_venue.data
       artist.seeking_description = form.seeking_description.data
       db.session.commit()
+      cache.invalidate('artists', 'venues', 'shows')
       flash('Artist ' + form.name.data + ' was successfully updated!')
   except Exception as e:
       flash(f'An error occurred: {e}')
@@ -427,10 +848,11 @@ def edit_venue_submission(venue_id):
       venue.image_link = form.image_link.data
       venue.facebook_link = form.facebook_link.data
       venue.website = form.website.data
-      venue.genres = ",".join(form.genres.data)
+      set_genres(venue, form.genres.data)
       venue.seeking_talent = form.seeking_talent.data
       venue.seeking_description = form.seeking_description.data
       db.session.commit()
+      cache.invalidate('venues', 'artists', 'shows')
       flash('Venue ' + form.name.data + ' was successfully updated!')
   except Exception as e:
       flash(f'An error occurred: {e}')
@@ -463,12 +885,13 @@ def create_artist_submission():
           image_link=form.image_link.data,
           facebook_link=form.facebook_link.data,
           website=form.website.data,
-          genres=",".join(form.genres.data),
           seeking_venue=form.seeking_venue.data,
           seeking_description=form.seeking_description.data,
       )
+      set_genres(artist, form.genres.data)
       db.session.add(artist)
       db.session.commit()
+      cache.invalidate('artists')
       flash('Artist ' + form.name.data + ' was successfully listed!')
   except Exception as e:
       flash(f'An error occurred: {e}')
@@ -483,21 +906,29 @@ def create_artist_submission():
 @app.route('/shows')
 def shows():
   # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  shows = Show.query.all()
-  data = [
-    {
-      "venue_id": show.venue.id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist.id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": str(show.start_time),
+  # ?when=upcoming|past, ?start=&end= (dates) and ?after=<cursor> narrow it down.
+  filters = {
+    "when": request.args.get('when'),
+    "start": request.args.get('start'),
+    "end": request.args.get('end'),
+  }
+  after = request.args.get('after')
+  try:
+    listing = {
+      "after": decode_show_cursor(after) if after else None,
+      "when": filters["when"],
+      "start": dateutil.parser.parse(filters["start"]) if filters["start"] else None,
+      "end": dateutil.parser.parse(filters["end"]) if filters["end"] else None,
     }
-    for show in shows
-  ]
-  return render_template('pages/shows.html', shows=data)
+  except (ValueError, OverflowError):
+    abort(400)
+  data, next_cursor = cache.get_or_set(
+      'shows', cache_key(listing), lambda: show_listing(**listing))
+  next_url = None
+  if next_cursor:
+    next_url = url_for('shows', after=next_cursor,
+                       **{k: v for k, v in filters.items() if v})
+  return render_template('pages/shows.html', shows=data, next_url=next_url)
 
 @app.route('/shows/create')
 def create_shows():
@@ -525,6 +956,7 @@ def create_show_submission():
       show = Show(venue=venue, artist=artist, start_time=start_time)
       db.session.add(show)
       db.session.commit()
+      cache.invalidate('venues', 'artists', 'shows')
       flash('Show was successfully listed!')
   except Exception as e:
       flash(f'An error occurred: {e}')
@@ -532,6 +964,10 @@ def create_show_submission():
       db.session.close()
   return render_template('pages/home.html')
 
+@app.route('/metrics/cache')
+def cache_metrics():
+  return jsonify(cache.stats())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -552,6 +988,260 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+app.cli.add_command(fyyur_cli)
+
+
+@fyyur_cli.command('refresh-counters')
+def refresh_counters_command():
+  """Recount upcoming shows; schedule this to age shows into the past."""
+  refresh_upcoming_show_counters()
+  db.session.commit()
+  cache.invalidate('venues', 'artists')
+
+
+# Columns read and written by `flask fyyur import/export`.
+BULK_COLUMNS = {
+  Venue: ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link',
+          'facebook_link', 'website', 'genres', 'seeking_talent',
+          'seeking_description'],
+  Artist: ['id', 'name', 'city', 'state', 'phone', 'image_link',
+           'facebook_link', 'website', 'genres', 'seeking_venue',
+           'seeking_description'],
+  Show: ['show_id', 'venue_id', 'artist_id', 'start_time'],
+}
+
+BULK_MODELS = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show,
+}
+
+
+def _reserve_ids(model, count):
+  '''`count` new ids for `model`, taken from its id sequence on Postgres.
+
+  Ids drawn with nextval are never handed out again, so records created
+  through the app while an import runs cannot collide with them. Other
+  databases have no sequence; the ids follow the current max(id) there.
+  '''
+  if db.engine.dialect.name == 'postgresql':
+    return [id for id, in db.session.execute(text(
+        "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+        "FROM generate_series(1, :count)"),
+        {'table': f'"{model.__tablename__}"', 'count': count})]
+  start = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+  return range(start, start + count)
+
+
+def _row_id(row, field, number, required=False):
+  value = row.get(field)
+  if value in (None, ''):
+    if required:
+      raise InvalidRow(number, f'{field} is required')
+    return None
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    raise InvalidRow(number, f'{field} must be a number, not {value!r}')
+
+
+def _owner_record(row, number, columns):
+  try:
+    record = {
+      column.name: coerce(row.get(column.name), column.type.python_type)
+      for column in columns
+    }
+  except (TypeError, ValueError, OverflowError) as e:
+    raise InvalidRow(number, str(e))
+  names = list(dict.fromkeys(
+      name.strip() for name in (record['genres'] or '').split(',')
+      if name.strip()))
+  record['genres'] = ','.join(names)
+  return _row_id(row, 'id', number), record, names
+
+
+def bulk_import_owners(model, rows, chunk_size=1000):
+  '''Insert venues or artists from dict rows, `chunk_size` rows per statement.
+
+  Each chunk is validated, then gets its ids reserved up front so that it,
+  and its genre links, goes in as a single executemany. An InvalidRow stops
+  the import; the chunks before it stay committed. Returns
+  `({file id: new id}, row count)`; the map lets a shows file refer to the
+  ids used in the imported file.
+  '''
+  association, owner_key = {
+    Venue: (venue_genre, 'venue_id'),
+    Artist: (artist_genre, 'artist_id'),
+  }[model]
+  columns = [model.__table__.c[name] for name in BULK_COLUMNS[model][1:]]
+  genre_ids = dict(db.session.query(Genre.name, Genre.id))
+  id_map = {}
+  count = 0
+  try:
+    for chunk in chunked(rows, chunk_size):
+      parsed = [_owner_record(row, count + number, columns)
+                for number, row in enumerate(chunk, 1)]
+      records, links = [], []
+      for new_id, (file_id, record, names) in zip(
+          _reserve_ids(model, len(parsed)), parsed):
+        record['id'] = new_id
+        if file_id is not None:
+          id_map[file_id] = new_id
+        for name in names:
+          if name not in genre_ids:
+            genre_ids[name] = db.session.execute(
+                Genre.__table__.insert().values(name=name)
+            ).inserted_primary_key[0]
+          links.append({owner_key: new_id, 'genre_id': genre_ids[name]})
+        records.append(record)
+      db.session.execute(model.__table__.insert(), records)
+      if links:
+        db.session.execute(association.insert(), links)
+      db.session.commit()
+      count += len(records)
+  finally:
+    db.session.rollback()
+    if count:
+      invalidate_search_indexes()
+  return id_map, count
+
+
+def bulk_import_shows(rows, venue_ids=None, artist_ids=None, chunk_size=1000):
+  '''Insert shows from dict rows, `chunk_size` rows per statement.
+
+  `venue_ids` and `artist_ids` translate the ids of the rows, typically the
+  maps returned by `bulk_import_owners`; ids missing from them are taken to
+  be existing database ids. An InvalidRow stops the import; the chunks
+  before it stay committed. Returns the row count.
+  '''
+  venue_ids = venue_ids or {}
+  artist_ids = artist_ids or {}
+  count = 0
+  try:
+    for chunk in chunked(rows, chunk_size):
+      records = []
+      for number, row in enumerate(chunk, count + 1):
+        venue_id = _row_id(row, 'venue_id', number, required=True)
+        artist_id = _row_id(row, 'artist_id', number, required=True)
+        try:
+          start_time = coerce(row.get('start_time'), datetime)
+        except (TypeError, ValueError, OverflowError) as e:
+          raise InvalidRow(number, f'start_time: {e}')
+        records.append({
+          'venue_id': venue_ids.get(venue_id, venue_id),
+          'artist_id': artist_ids.get(artist_id, artist_id),
+          'start_time': start_time,
+        })
+      db.session.execute(Show.__table__.insert(), records)
+      db.session.commit()
+      count += len(records)
+  finally:
+    db.session.rollback()
+    # Core inserts skip the Show mapper events, so recount once at the end.
+    if count:
+      refresh_upcoming_show_counters()
+      db.session.commit()
+  return count
+
+
+def bulk_export(model, chunk_size=1000):
+  '''Yield every row of a table as a dict, reading `chunk_size` at a time.'''
+  columns = [model.__table__.c[name] for name in BULK_COLUMNS[model]]
+  result = db.session.execute(
+      select(columns).order_by(columns[0]).execution_options(stream_results=True))
+  while True:
+    rows = result.fetchmany(chunk_size)
+    if not rows:
+      return
+    for row in rows:
+      yield dict(zip(BULK_COLUMNS[model], row))
+
+
+def _click_file_format(path, param_hint):
+  try:
+    return file_format(path)
+  except ValueError as e:
+    raise click.BadParameter(str(e), param_hint=param_hint)
+
+
+def _report(label, count, elapsed):
+  rate = count / elapsed if elapsed else count
+  click.echo(f'{label}: {count} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)')
+
+
+@fyyur_cli.command('import')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False))
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False))
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows per INSERT batch.')
+def import_command(venues, artists, shows, chunk_size):
+  """Load venues, artists and shows from CSV or NDJSON files.
+
+  The venue_id and artist_id of shows refer to the id column of the venue
+  and artist files given in the same run, or else to existing records.
+  """
+  formats = {}
+  for option, path in (('--venues', venues), ('--artists', artists),
+                       ('--shows', shows)):
+    if path:
+      formats[path] = _click_file_format(path, option)
+
+  id_maps = {}
+  try:
+    for table, path in (('venues', venues), ('artists', artists)):
+      if path:
+        model = BULK_MODELS[table]
+        start = time.perf_counter()
+        with open(path, newline='') as fh:
+          id_maps[model], count = bulk_import_owners(
+              model, read_rows(fh, formats[path]), chunk_size)
+        _report(table, count, time.perf_counter() - start)
+    if shows:
+      start = time.perf_counter()
+      with open(shows, newline='') as fh:
+        count = bulk_import_shows(
+            read_rows(fh, formats[shows]), id_maps.get(Venue),
+            id_maps.get(Artist), chunk_size)
+      _report('shows', count, time.perf_counter() - start)
+  except InvalidRow as e:
+    raise click.ClickException(f'{click.format_filename(fh.name)}: {e}')
+  except SQLAlchemyError as e:
+    # e.g. a show whose venue_id matches no venue, on PostgreSQL.
+    raise click.ClickException(
+        f'{click.format_filename(fh.name)}: {getattr(e, "orig", None) or e}')
+  finally:
+    cache.invalidate('venues', 'artists', 'shows')
+
+
+@fyyur_cli.command('export')
+@click.argument('table', type=click.Choice(sorted(BULK_MODELS)))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows fetched per round trip.')
+def export_command(table, path, chunk_size):
+  """Write a table to a CSV or NDJSON file."""
+  model = BULK_MODELS[table]
+  format = _click_file_format(path, 'PATH')
+  start = time.perf_counter()
+  count = 0
+
+  def counted(rows):
+    nonlocal count
+    for row in rows:
+      count += 1
+      yield row
+
+  with open(path, 'w', newline='') as fh:
+    write_rows(fh, counted(bulk_export(model, chunk_size)),
+               BULK_COLUMNS[model], format)
+  _report(table, count, time.perf_counter() - start)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
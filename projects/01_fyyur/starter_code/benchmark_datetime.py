@@ -0,0 +1,57 @@
+'''Per-row cost of the `datetime` template filter on a 10k-show page.
+
+    python benchmark_datetime.py [--shows 10000]
+
+Reports the filter as it was (parse the string, then let Babel do the rest)
+and as it is now, for distinct start times and for start times repeated the
+way shows cluster on a few hours. Nothing is asserted; timings vary by host.
+'''
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import DATETIME_FORMATS, _format_datetime, format_datetime
+
+
+def reparse_and_format(value, format):
+  '''The filter before it took datetimes and memoized its output.'''
+  date = dateutil.parser.parse(value)
+  format = DATETIME_FORMATS.get(format, format)
+  return babel.dates.format_datetime(date, format)
+
+
+def per_row_us(render, values):
+  start = time.perf_counter()
+  for value in values:
+    render(value)
+  return round(1e6 * (time.perf_counter() - start) / len(values), 2)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--shows', type=int, default=10000)
+  args = parser.parse_args()
+
+  times = [datetime(2020, 1, 1) + timedelta(minutes=i)
+           for i in range(args.shows)]
+  report = {'shows': args.shows}
+  report['reparse_us_per_row'] = per_row_us(
+      lambda date: reparse_and_format(str(date), 'full'), times)
+  _format_datetime.cache_clear()
+  report['filter_us_per_row'] = per_row_us(
+      lambda date: format_datetime(date, 'full'), times)
+  _format_datetime.cache_clear()
+  report['filter_repeated_us_per_row'] = per_row_us(
+      lambda date: format_datetime(date.replace(minute=0), 'full'), times)
+  print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import dateutil.parser
+
+FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+# FORMATS, InvalidRow, file_format, read_rows and chunked are the canonical
+# versions of these file helpers; the trivia backend's flaskr/bulk.py
+# follows them for questions. Change both together.
+class InvalidRow(ValueError):
+    '''A row that cannot be imported; `number` counts from 1.'''
+
+    def __init__(self, number, message):
+        super().__init__(f'row {number}: {message}')
+        self.number = number
+
+
+def file_format(path):
+    '''Return 'csv' or 'ndjson' depending on the file extension.'''
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Unsupported file type {extension!r}, '
+                         f'expected one of {", ".join(FORMATS)}')
+    return FORMATS[extension]
+
+
+def read_rows(fh, format):
+    '''Yield one dict per row of a CSV or NDJSON file, one line at a time.
+
+    An NDJSON line that is not a JSON object raises InvalidRow.
+    '''
+    if format == 'csv':
+        yield from csv.DictReader(fh)
+        return
+    number = 0
+    for line in fh:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise InvalidRow(number, f'invalid JSON: {e}')
+        if not isinstance(row, dict):
+            raise InvalidRow(number, 'expected a JSON object')
+        yield row
+
+
+def write_rows(fh, rows, fields, format):
+    '''Write dict rows to a CSV or NDJSON file without holding them in memory.'''
+    if format == 'csv':
+        writer = csv.DictWriter(fh, fieldnames=fields)
+        writer.writeheader()
+    for row in rows:
+        row = {
+            field: value.isoformat() if isinstance(value, datetime) else value
+            for field, value in row.items()
+        }
+        if format == 'csv':
+            writer.writerow(row)
+        else:
+            fh.write(json.dumps(row) + '\n')
+
+
+def chunked(iterable, size):
+    '''Yield lists of up to `size` items.'''
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def coerce(value, python_type):
+    '''Convert a CSV string (or a JSON value) to a column's python type.'''
+    if value is None or value == '':
+        return None
+    if python_type is bool:
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 't')
+    if python_type is datetime:
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return dateutil.parser.parse(value)
+    return python_type(value)
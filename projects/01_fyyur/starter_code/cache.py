@@ -0,0 +1,132 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+
+class LRUBackend:
+    '''In-process cache holding at most `maxsize` entries for `ttl` seconds.'''
+
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        # Generation counters are kept apart so that eviction never resets one.
+        self._counters = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class RedisBackend:
+    '''Cache stored in Redis, shared by every process of the app.
+
+    `client` only needs `get`, `set(key, value, ex=...)` and `incr`, so any
+    Redis-compatible client (or a fake one in tests) can be used. Values
+    are stored as JSON, with datetimes tagged so they come back as datetimes.
+    '''
+
+    def __init__(self, client, ttl=60, prefix='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value, object_hook=_decode)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, default=_encode),
+                        ex=self.ttl)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        self.client.incr(self.prefix + key)
+
+
+class Cache:
+    '''Read-through cache of page data, invalidated by namespace.
+
+    Every namespace has a generation number that is part of its keys;
+    invalidating a namespace bumps the generation so its old entries are
+    never read again and simply age out of the backend.
+    '''
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, namespace, key, compute):
+        generation = self.backend.counter(f'generation:{namespace}')
+        full_key = f'{namespace}:{generation}:{key}'
+        value = self.backend.get(full_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.backend.set(full_key, value)
+        return value
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.incr(f'generation:{namespace}')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cache_from_config(config):
+    '''Build the cache described by the CACHE_* settings.'''
+    ttl = config.get('CACHE_TTL', 60)
+    if config.get('CACHE_TYPE') == 'redis':
+        import redis
+        client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return Cache(RedisBackend(client, ttl=ttl))
+    return Cache(LRUBackend(config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl))
@@ -0,0 +1,77 @@
+"""normalized genres
+
+Revision ID: 38ffa6ed12b8
+Revises: b8e55e808820
+Create Date: 2020-02-09 11:47:32.905116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '38ffa6ed12b8'
+down_revision = 'b8e55e808820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genre_genre_id', 'venue_genre', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('artist_genre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genre_genre_id', 'artist_genre', ['genre_id', 'artist_id'], unique=False)
+
+    # Backfill from the comma-joined genres columns.
+    bind = op.get_bind()
+    links = {}
+    for table, association in (('Venue', 'venue_genre'), ('Artist', 'artist_genre')):
+        rows = bind.execute(sa.text(
+            f'SELECT id, genres FROM "{table}" WHERE genres IS NOT NULL'))
+        links[association] = [
+            (owner_id, name.strip())
+            for owner_id, genres in rows
+            for name in dict.fromkeys(genres.split(','))
+            if name.strip()
+        ]
+    names = sorted({name for pairs in links.values() for _, name in pairs})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict(
+        (name, genre_id) for genre_id, name in
+        bind.execute(sa.text('SELECT id, name FROM genre')))
+    for association, pairs in links.items():
+        owner = 'venue_id' if association == 'venue_genre' else 'artist_id'
+        table = sa.table(association, sa.column(owner), sa.column('genre_id'))
+        rows = {(owner_id, genre_ids[name]) for owner_id, name in pairs}
+        if rows:
+            op.bulk_insert(table, [
+                {owner: owner_id, 'genre_id': genre_id}
+                for owner_id, genre_id in sorted(rows)
+            ])
+
+
+def downgrade():
+    op.drop_index('ix_artist_genre_genre_id', table_name='artist_genre')
+    op.drop_table('artist_genre')
+    op.drop_index('ix_venue_genre_genre_id', table_name='venue_genre')
+    op.drop_table('venue_genre')
+    op.drop_table('genre')
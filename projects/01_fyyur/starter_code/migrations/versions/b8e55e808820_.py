@@ -0,0 +1,54 @@
+"""search vectors for venues and artists
+
+Revision ID: b8e55e808820
+Revises: 11f914badda3
+Create Date: 2020-02-02 18:21:07.412930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e55e808820'
+down_revision = '11f914badda3'
+branch_labels = None
+depends_on = None
+
+# Weighted the same way search.FIELD_WEIGHTS ranks the in-process index.
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(city, '')), 'B') ||
+    setweight(to_tsvector('simple', replace(coalesce(genres, ''), ',', ' ')), 'C')
+"""
+
+
+def upgrade():
+    # Full-text search only exists on PostgreSQL; other databases fall back
+    # to the in-process index in search.py.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            f'ALTER TABLE "{table}" ADD COLUMN search_vector tsvector '
+            f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+        )
+        op.create_index(
+            f'ix_{table}_search_vector', table, ['search_vector'],
+            postgresql_using='gin'
+        )
+        op.create_index(
+            f'ix_{table}_name_trgm', table, ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Venue', 'Artist'):
+        op.drop_index(f'ix_{table}_name_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,85 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# Same weights ts_rank gives to the A, B and C labels set by the
+# search_vector migration on PostgreSQL (name, city and genres).
+FIELD_WEIGHTS = {
+    'name': 1.0,
+    'city': 0.4,
+    'genres': 0.2,
+}
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN.findall((text or '').lower())
+
+
+def prefix_tsquery(term):
+    '''Turn free text into a prefix-matching tsquery, e.g. "music:* & hop:*".
+
+    Only word characters survive, so the result is always a valid query.
+    '''
+    return ' & '.join(f'{token}:*' for token in tokenize(term))
+
+
+class SearchIndex:
+    '''In-process inverted index used when the database has no full-text search.
+
+    Documents are ranked the way the PostgreSQL search ranks them: every query
+    token must prefix-match a token of the document, and the score adds up the
+    weight of the best field each query token matched in. Documents whose name
+    contains the whole search term are also returned, with a score of 0.
+    '''
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.names = {}
+        self._tokens = None
+
+    def add(self, doc_id, name, city=None, genres=None):
+        self.names[doc_id] = (name or '').lower()
+        for field, text in (('name', name), ('city', city), ('genres', genres)):
+            for token in tokenize(text):
+                weights = self.postings[token]
+                weights[doc_id] = max(weights.get(doc_id, 0),
+                                      FIELD_WEIGHTS[field])
+        self._tokens = None
+
+    def _matching_tokens(self, prefix):
+        if self._tokens is None:
+            self._tokens = sorted(self.postings)
+        i = bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            yield self._tokens[i]
+            i += 1
+
+    def search(self, term):
+        '''Return `[(doc_id, score)]` best match first, ties broken by name.'''
+        tokens = tokenize(term)
+        if not tokens:
+            return [(doc_id, 0) for doc_id in
+                    sorted(self.names, key=lambda d: (self.names[d], d))]
+
+        scores = None
+        for token in tokens:
+            matched = {}
+            for indexed in self._matching_tokens(token):
+                for doc_id, weight in self.postings[indexed].items():
+                    matched[doc_id] = max(matched.get(doc_id, 0), weight)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {doc_id: score + matched[doc_id]
+                          for doc_id, score in scores.items()
+                          if doc_id in matched}
+
+        substring = term.strip().lower()
+        for doc_id, name in self.names.items():
+            if substring in name:
+                scores.setdefault(doc_id, 0)
+
+        return sorted(scores.items(),
+                      key=lambda item: (-item[1], self.names[item[0]], item[0]))
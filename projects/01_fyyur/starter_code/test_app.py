@@ -0,0 +1,587 @@
+import os
+import time
+import unittest
+from unittest import mock
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+import dateutil.parser
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import (app, db, Venue, Artist, Show, venue_directory, venue_timeline,
+                 artist_timeline, venue_search, artist_search, show_listing,
+                 decode_show_cursor, set_genres, artist_directory,
+                 refresh_upcoming_show_counters, cache, format_datetime,
+                 _format_datetime, bulk_import_owners, bulk_import_shows,
+                 bulk_export)
+from bulk import InvalidRow
+from cache import Cache, LRUBackend, RedisBackend
+
+# Seconds the /venues page may take to render with the benchmark dataset.
+VENUES_PAGE_BUDGET = float(os.environ.get('VENUES_PAGE_BUDGET', 5))
+BENCHMARK_VENUES = 10000
+BENCHMARK_SHOWS = 200000
+
+
+@contextmanager
+def captured_queries():
+    """Collect the (statement, parameters) sent to the database."""
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        queries.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def query_plan(statement, parameters):
+    """The database's plan for a statement, as one string."""
+    explain = ('EXPLAIN ' if db.engine.dialect.name == 'postgresql'
+               else 'EXPLAIN QUERY PLAN ')
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(explain + statement, parameters)
+        return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+    finally:
+        connection.close()
+
+
+class FakeRedis:
+    """The subset of the redis client used by RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+
+class CacheTestCase(unittest.TestCase):
+    """This class represents the page cache test case"""
+
+    def setUp(self):
+        self.time = 0
+        self.lru = Cache(LRUBackend(maxsize=2, ttl=10, clock=lambda: self.time))
+
+    def test_lru_backend_evicts_and_expires(self):
+        for key in ('a', 'b', 'c'):
+            self.lru.get_or_set('venues', key, lambda: key)
+
+        self.assertEqual(self.lru.get_or_set('venues', 'a', lambda: 'new'), 'new')
+        self.assertEqual(self.lru.get_or_set('venues', 'c', lambda: 'new'), 'c')
+        self.time = 11
+        self.assertEqual(self.lru.get_or_set('venues', 'c', lambda: 'new'), 'new')
+        self.assertEqual(self.lru.stats(),
+                         {'hits': 1, 'misses': 5, 'hit_rate': 1 / 6})
+
+    def test_invalidate_only_drops_its_namespace(self):
+        redis = Cache(RedisBackend(FakeRedis()))
+        for cache_under_test in (self.lru, redis):
+            cache_under_test.get_or_set('venues', 'directory', lambda: [1])
+            cache_under_test.get_or_set('shows', 'listing', lambda: [2])
+            cache_under_test.invalidate('venues')
+
+            self.assertEqual(
+                cache_under_test.get_or_set('venues', 'directory', lambda: [3]),
+                [3])
+            self.assertEqual(
+                cache_under_test.get_or_set('shows', 'listing', lambda: [4]),
+                [2])
+
+    def test_redis_backend_round_trips_datetimes(self):
+        backend = RedisBackend(FakeRedis())
+        value = {'start_time': datetime(2020, 5, 21, 21, 30)}
+        backend.set('show', value)
+        self.assertEqual(backend.get('show'), value)
+
+
+class DatetimeFilterTestCase(unittest.TestCase):
+    """This class represents the datetime template filter test case"""
+
+    @staticmethod
+    def reparse_and_format(value, format):
+        """The filter as it was: parse a string, then let Babel do the rest."""
+        date = dateutil.parser.parse(value)
+        format = {
+            'full': "EEEE MMMM, d, y 'at' h:mma",
+            'medium': "EE MM, dd, y h:mma",
+        }.get(format, format)
+        return babel.dates.format_datetime(date, format)
+
+    def test_matches_babel_for_datetimes_and_strings(self):
+        date = datetime(2019, 5, 21, 21, 30)
+        for format in ('full', 'medium', 'yyyy-MM-dd'):
+            expected = self.reparse_and_format(str(date), format)
+            self.assertEqual(format_datetime(date, format), expected)
+            self.assertEqual(format_datetime(str(date), format), expected)
+        self.assertEqual(format_datetime('2019-05-21T21:30:00.000Z', 'full'),
+                         'Tuesday May, 21, 2019 at 9:30PM')
+
+    def test_matches_babel_for_aware_datetimes_and_zones(self):
+        date = datetime(2019, 5, 21, 21, 30,
+                        tzinfo=timezone(timedelta(hours=2)))
+        for format in ('full', "yyyy-MM-dd HH:mm zzz"):
+            self.assertEqual(format_datetime(date, format),
+                             self.reparse_and_format(date.isoformat(), format))
+        self.assertEqual(format_datetime(datetime(2019, 5, 21, 21, 30),
+                                         "HH:mm zzz"), '21:30 UTC')
+
+    def test_repeated_times_are_memoized(self):
+        _format_datetime.cache_clear()
+        for _ in range(3):
+            format_datetime(datetime(2020, 1, 1, 20), 'full')
+        self.assertEqual(_format_datetime.cache_info().hits, 2)
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and create a fresh schema."""
+        self.app = app
+        self.client = self.app.test_client
+        self.now = datetime(2020, 1, 1)
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        db.create_all()
+        cache.invalidate('venues', 'artists', 'shows')
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+
+    def add_venue(self, name, city, state, genres=('Jazz',)):
+        venue = Venue(name=name, city=city, state=state)
+        set_genres(venue, genres)
+        db.session.add(venue)
+        db.session.flush()
+        return venue
+
+    def add_artist(self, name, genres=('Jazz',)):
+        artist = Artist(name=name)
+        set_genres(artist, genres)
+        db.session.add(artist)
+        db.session.flush()
+        return artist
+
+    def add_show(self, venue, artist, start_time):
+        db.session.add(Show(venue=venue, artist=artist, start_time=start_time))
+
+    def test_venue_directory_groups_by_area(self):
+        hop = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        park = self.add_venue('Park Square Live Music', 'San Francisco', 'CA')
+        dueling = self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        artist = self.add_artist('Guns N Petals')
+        self.add_show(hop, artist, self.now + timedelta(days=1))
+        self.add_show(hop, artist, self.now + timedelta(days=2))
+        self.add_show(hop, artist, self.now - timedelta(days=1))
+        self.add_show(dueling, artist, self.now - timedelta(days=1))
+        db.session.commit()
+
+        refresh_upcoming_show_counters(now=self.now)
+        areas = venue_directory()
+
+        self.assertEqual(
+            [(a['city'], a['state']) for a in areas],
+            [('San Francisco', 'CA'), ('New York', 'NY')])
+        self.assertEqual(areas[0]['venues'], [
+            {'id': hop.id, 'name': hop.name, 'num_upcoming_shows': 2},
+            {'id': park.id, 'name': park.name, 'num_upcoming_shows': 0},
+        ])
+        self.assertEqual(areas[1]['venues'], [
+            {'id': dueling.id, 'name': dueling.name, 'num_upcoming_shows': 0},
+        ])
+
+    def test_venue_timeline_splits_past_and_upcoming(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        for days in (-3, -1, 1, 2, 5):
+            self.add_show(venue, artist, self.now + timedelta(days=days))
+        db.session.commit()
+
+        timeline = venue_timeline(venue.id, now=self.now)
+
+        self.assertEqual(timeline['past_shows_count'], 2)
+        self.assertEqual(timeline['upcoming_shows_count'], 3)
+        self.assertEqual(
+            [s['start_time'] for s in timeline['upcoming_shows']],
+            [self.now + timedelta(days=d) for d in (1, 2, 5)])
+        self.assertEqual(
+            [s['start_time'] for s in timeline['past_shows']],
+            [self.now + timedelta(days=d) for d in (-1, -3)])
+        self.assertEqual(timeline['past_shows'][0], {
+            'artist_id': artist.id,
+            'artist_name': artist.name,
+            'artist_image_link': None,
+            'start_time': self.now - timedelta(days=1),
+        })
+
+    def test_artist_timeline_pages_each_section(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        for days in (-3, -1, 1, 2, 5):
+            self.add_show(venue, artist, self.now + timedelta(days=days))
+        db.session.commit()
+
+        timeline = artist_timeline(
+            artist.id, now=self.now, limit=2, past_page=2, upcoming_page=2)
+
+        self.assertEqual(timeline['past_shows'], [])
+        self.assertEqual(timeline['past_shows_count'], 2)
+        self.assertEqual(timeline['upcoming_shows_count'], 3)
+        self.assertEqual(timeline['upcoming_shows'], [{
+            'venue_id': venue.id,
+            'venue_name': venue.name,
+            'venue_image_link': None,
+            'start_time': self.now + timedelta(days=5),
+        }])
+
+    def test_venue_search_is_ranked_and_prefix_aware(self):
+        hop = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        park = self.add_venue('Park Square Live Music & Coffee',
+                              'San Francisco', 'CA')
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY')
+        artist = self.add_artist('Guns N Petals')
+        self.add_show(hop, artist, self.now + timedelta(days=1))
+        db.session.commit()
+
+        refresh_upcoming_show_counters(now=self.now)
+        results = venue_search('Music')
+
+        self.assertEqual(results['count'], 2)
+        self.assertEqual(results['data'], [
+            {'id': park.id, 'name': park.name, 'num_upcoming_shows': 0},
+            {'id': hop.id, 'name': hop.name, 'num_upcoming_shows': 1},
+        ])
+        self.assertEqual(
+            [v['id'] for v in venue_search('Hop')['data']], [hop.id])
+        self.assertEqual(
+            [v['id'] for v in venue_search('san fran')['data']],
+            [park.id, hop.id])
+
+    def test_artist_search_pages_results(self):
+        for name in ('Guns N Petals', 'Matt Quevedo', 'The Wild Sax Band'):
+            self.add_artist(name)
+        db.session.commit()
+
+        first = artist_search('A', per_page=2)
+        second = artist_search('A', page=2, per_page=2)
+
+        self.assertEqual(first['count'], 3)
+        self.assertEqual(len(first['data']), 2)
+        self.assertEqual(
+            [a['name'] for a in second['data']], ['The Wild Sax Band'])
+
+    def test_search_index_sees_new_artists(self):
+        self.assertEqual(artist_search('band')['count'], 0)
+        self.add_artist('The Wild Sax Band')
+        db.session.commit()
+        self.assertEqual(artist_search('band')['count'], 1)
+
+    def test_show_listing_keyset_pagination(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        # Two shows share a start time so the show_id tie-breaker matters.
+        for days in (-2, -1, 1, 1, 3):
+            self.add_show(venue, artist, self.now + timedelta(days=days))
+        db.session.commit()
+
+        pages, after = [], None
+        while True:
+            shows, after = show_listing(after=after, limit=2, now=self.now)
+            pages.append([s['start_time'] for s in shows])
+            if after is None:
+                break
+            after = decode_show_cursor(after)
+
+        self.assertEqual(pages, [
+            [self.now + timedelta(days=d) for d in (-2, -1)],
+            [self.now + timedelta(days=d) for d in (1, 1)],
+            [self.now + timedelta(days=3)],
+        ])
+
+    def test_show_listing_filters(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        for days in (-2, -1, 1, 3):
+            self.add_show(venue, artist, self.now + timedelta(days=days))
+        db.session.commit()
+
+        past, _ = show_listing(when='past', now=self.now)
+        upcoming, _ = show_listing(when='upcoming', now=self.now)
+        window, _ = show_listing(start=self.now - timedelta(days=1),
+                                 end=self.now + timedelta(days=2))
+
+        self.assertEqual(
+            [s['start_time'] for s in past],
+            [self.now + timedelta(days=d) for d in (-1, -2)])
+        self.assertEqual(len(upcoming), 2)
+        self.assertEqual(
+            [s['start_time'] for s in window],
+            [self.now + timedelta(days=d) for d in (-1, 1)])
+        self.assertEqual(window[0]['venue_name'], venue.name)
+        self.assertEqual(window[0]['artist_name'], artist.name)
+
+    def test_shows_page_rejects_bad_cursor(self):
+        res = self.client().get('/shows?after=yesterday')
+        self.assertEqual(res.status_code, 400)
+
+    def test_shows_page_rejects_out_of_range_dates(self):
+        res = self.client().get('/shows?start=99999999999999999999')
+        self.assertEqual(res.status_code, 400)
+
+    def test_set_genres_reuses_genre_rows(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA',
+                               genres=['Jazz', 'Reggae', 'Jazz'])
+        artist = self.add_artist('Guns N Petals', genres=['Reggae'])
+        db.session.commit()
+
+        self.assertEqual(venue.genres, 'Jazz,Reggae')
+        self.assertEqual(artist.genre_tags, venue.genre_tags[1:])
+
+    def test_directories_filter_by_genre(self):
+        hop = self.add_venue('The Musical Hop', 'San Francisco', 'CA',
+                             genres=['Jazz', 'Reggae'])
+        self.add_venue('The Dueling Pianos Bar', 'New York', 'NY',
+                       genres=['Classical'])
+        self.add_artist('Guns N Petals', genres=['Rock n Roll'])
+        sax = self.add_artist('The Wild Sax Band', genres=['Jazz'])
+        db.session.commit()
+
+        areas = venue_directory(genre='Reggae')
+
+        self.assertEqual(len(areas), 1)
+        self.assertEqual([v['id'] for v in areas[0]['venues']], [hop.id])
+        self.assertEqual(artist_directory(genre='Jazz'),
+                         [{'id': sax.id, 'name': sax.name}])
+        self.assertEqual(len(artist_directory()), 2)
+
+    def test_unknown_genre_not_found(self):
+        res = self.client().get('/genres/Polka/venues')
+        self.assertEqual(res.status_code, 404)
+
+    def assertUsesIndex(self, index, call):
+        """Every query `call` runs on the show table must use `index`."""
+        with captured_queries() as queries:
+            call()
+        plans = [query_plan(*query) for query in queries
+                 if 'FROM show' in query[0] or 'JOIN show' in query[0]]
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn(index, plan)
+
+    def test_hot_queries_use_show_indexes(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        for days in range(-5, 5):
+            self.add_show(venue, artist, self.now + timedelta(days=days))
+        db.session.commit()
+
+        self.assertUsesIndex('ix_show_venue_id_start_time',
+                             lambda: venue_timeline(venue.id, now=self.now))
+        self.assertUsesIndex('ix_show_artist_id_start_time',
+                             lambda: artist_timeline(artist.id, now=self.now))
+        self.assertUsesIndex('ix_show_venue_id_start_time',
+                             lambda: refresh_upcoming_show_counters(
+                                 now=self.now, artist_ids=[]))
+        self.assertUsesIndex('ix_show_artist_id_start_time',
+                             lambda: refresh_upcoming_show_counters(
+                                 now=self.now, venue_ids=[]))
+        self.assertUsesIndex('ix_show_start_time',
+                             lambda: show_listing(when='upcoming', now=self.now))
+
+    def test_upcoming_show_counters_follow_writes(self):
+        hop = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        park = self.add_venue('Park Square Live Music', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        now = datetime.now()
+        self.add_show(hop, artist, now + timedelta(days=1))
+        self.add_show(park, artist, now + timedelta(days=1))
+        self.add_show(park, artist, now - timedelta(days=1))
+        db.session.commit()
+
+        self.assertEqual((hop.num_upcoming_shows, park.num_upcoming_shows,
+                          artist.num_upcoming_shows), (1, 1, 2))
+
+        artist_id = artist.id
+        res = self.client().delete(f'/venues/{park.id}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Show.query.count(), 1)
+        self.assertEqual(Artist.query.get(artist_id).num_upcoming_shows, 1)
+
+    def test_refresh_ages_shows_into_the_past(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        self.add_show(venue, artist, datetime.now() + timedelta(days=1))
+        db.session.commit()
+
+        refresh_upcoming_show_counters(now=datetime.now() + timedelta(days=2))
+        db.session.expire_all()
+
+        self.assertEqual(venue.num_upcoming_shows, 0)
+        self.assertEqual(artist.num_upcoming_shows, 0)
+
+    def test_venue_directory_does_not_read_shows(self):
+        self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        db.session.commit()
+        with captured_queries() as queries:
+            venue_directory()
+        self.assertFalse([q for q, _ in queries
+                          if 'FROM show' in q or 'JOIN show' in q])
+
+    def test_new_show_invalidates_cached_pages(self):
+        venue = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        artist = self.add_artist('Guns N Petals')
+        db.session.commit()
+        venue_id, artist_id = venue.id, artist.id
+        hits = cache.hits
+
+        self.client().get(f'/venues/{venue_id}')
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(cache.hits, hits + 1)
+        self.assertIn(b'0 Upcoming Shows', res.data)
+
+        start_time = datetime.now() + timedelta(days=1)
+        self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        res = self.client().get(f'/venues/{venue_id}')
+
+        self.assertIn(b'1 Upcoming Show', res.data)
+        self.assertEqual(cache.hits, hits + 1)
+
+    def test_bulk_import_links_shows_through_file_ids(self):
+        existing = self.add_venue('The Musical Hop', 'San Francisco', 'CA')
+        db.session.commit()
+        venue_rows = [
+            {'id': '10', 'name': 'Park Square Live Music', 'city': 'SF',
+             'state': 'CA', 'genres': 'Jazz,Folk', 'seeking_talent': 'true'},
+            {'id': '20', 'name': 'The Dueling Pianos Bar', 'city': 'NY',
+             'state': 'NY', 'genres': '', 'seeking_talent': 'false'},
+        ]
+        artist_rows = [{'id': 7, 'name': 'Guns N Petals', 'genres': 'Jazz'}]
+        upcoming = (datetime.now() + timedelta(days=1)).isoformat()
+        show_rows = [
+            {'venue_id': '10', 'artist_id': '7', 'start_time': upcoming},
+            {'venue_id': str(existing.id), 'artist_id': '7',
+             'start_time': '2019-06-15 23:00:00'},
+        ]
+
+        venue_ids, venues = bulk_import_owners(Venue, venue_rows, chunk_size=1)
+        artist_ids, _ = bulk_import_owners(Artist, artist_rows, chunk_size=1)
+        shows = bulk_import_shows(show_rows, venue_ids, artist_ids,
+                                  chunk_size=1)
+
+        self.assertEqual((venues, shows), (2, 2))
+        park = Venue.query.get(venue_ids[10])
+        self.assertEqual(park.name, 'Park Square Live Music')
+        self.assertTrue(park.seeking_talent)
+        self.assertEqual(sorted(g.name for g in park.genre_tags), ['Folk', 'Jazz'])
+        self.assertEqual(park.num_upcoming_shows, 1)
+        self.assertEqual(
+            [(s['venue_id'], s['artist_id']) for s in bulk_export(Show)],
+            [(venue_ids[10], artist_ids[7]), (existing.id, artist_ids[7])])
+        self.assertEqual(artist_search('petals')['count'], 1)
+
+    def test_bulk_import_stops_at_an_invalid_row(self):
+        rows = [{'id': '1', 'name': 'Park Square Live Music'},
+                {'id': 'x', 'name': 'The Dueling Pianos Bar'}]
+
+        with self.assertRaises(InvalidRow) as raised:
+            bulk_import_owners(Venue, rows, chunk_size=1)
+
+        self.assertEqual(raised.exception.number, 2)
+        self.assertIn("'x'", str(raised.exception))
+        self.assertEqual([v.name for v in Venue.query],
+                         ['Park Square Live Music'])
+        with self.assertRaises(InvalidRow) as raised:
+            bulk_import_shows([{'venue_id': '1', 'start_time': '2020-01-01'}])
+        self.assertEqual(str(raised.exception), 'row 1: artist_id is required')
+
+    def test_import_command_reports_bad_input(self):
+        runner = self.app.test_cli_runner()
+        with runner.isolated_filesystem():
+            with open('venues.txt', 'w') as fh:
+                fh.write('id,name\n1,Hop\n')
+            with open('venues.csv', 'w') as fh:
+                fh.write('id,name\n1,Hop\nnope,Bar\n')
+            with open('artists.ndjson', 'w') as fh:
+                fh.write('{"id": 1, "name": "Petals"}\n[1, 2]\n')
+            with open('shows.ndjson', 'w') as fh:
+                fh.write('{"venue_id": 9, "artist_id": 9, '
+                         '"start_time": "2020-01-01"}\n')
+
+            unsupported = runner.invoke(
+                args=['fyyur', 'import', '--venues', 'venues.txt'])
+            malformed = runner.invoke(
+                args=['fyyur', 'import', '--venues', 'venues.csv'])
+            not_an_object = runner.invoke(
+                args=['fyyur', 'import', '--artists', 'artists.ndjson'])
+            with mock.patch('app.bulk_import_shows', side_effect=IntegrityError(
+                    'INSERT INTO show', {}, Exception('violates foreign key'))):
+                rejected = runner.invoke(
+                    args=['fyyur', 'import', '--shows', 'shows.ndjson'])
+
+        self.assertEqual(unsupported.exit_code, 2)
+        self.assertIn("Unsupported file type '.txt'", unsupported.output)
+        self.assertEqual(malformed.exit_code, 1)
+        self.assertIn("venues.csv: row 2: id must be a number", malformed.output)
+        self.assertEqual(not_an_object.exit_code, 1)
+        self.assertIn("artists.ndjson: row 2: expected a JSON object",
+                      not_an_object.output)
+        self.assertEqual(rejected.exit_code, 1)
+        self.assertIn("shows.ndjson: violates foreign key", rejected.output)
+
+    def test_show_venue_not_found(self):
+        res = self.client().get('/venues/1000')
+        self.assertEqual(res.status_code, 404)
+
+    def test_venues_page_renders_under_budget(self):
+        """Seed 10k venues and 200k shows and time a /venues render."""
+        db.session.execute(Venue.__table__.insert(), [
+            {'id': i, 'name': f'Venue {i}', 'city': f'City {i % 500}',
+             'state': 'CA', 'genres': 'Jazz'}
+            for i in range(1, BENCHMARK_VENUES + 1)
+        ])
+        db.session.execute(Artist.__table__.insert(), [
+            {'id': 1, 'name': 'Artist', 'genres': 'Jazz'}
+        ])
+        db.session.execute(Show.__table__.insert(), [
+            {'venue_id': i % BENCHMARK_VENUES + 1, 'artist_id': 1,
+             'start_time': self.now + timedelta(hours=i - BENCHMARK_SHOWS // 2)}
+            for i in range(BENCHMARK_SHOWS)
+        ])
+        refresh_upcoming_show_counters()
+        db.session.commit()
+
+        start = time.perf_counter()
+        res = self.client().get('/venues')
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Venue 10000', res.data)
+        self.assertLess(elapsed, VENUES_PAGE_BUDGET)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,4 @@
+'''Load and latency benchmarks for the trivia API.
+
+Run `python -m benchmarks --help` from the backend directory.
+'''
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from flaskr import create_app
+from . import draw
+from .dataset import seed
+from .load import ClientDriver, ServerDriver, run, scenarios
+from .serialize import compare
+
+DRIVERS = {
+    'client': ClientDriver,
+    'server': ServerDriver,
+}
+
+
+# Canonical; the coffee shop's benchmarks/__main__.py has a checked copy.
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Seed a local database with synthetic questions and '
+                    'report the latency and throughput of the trivia API.')
+    parser.add_argument(
+        '--database-url',
+        default='sqlite:///' + os.path.join(tempfile.gettempdir(),
+                                            'trivia_benchmark.db'),
+        help='database to seed; its content is replaced (default: %(default)s)')
+    parser.add_argument('--questions', type=int, default=100000,
+                        help='questions to seed (default: %(default)s)')
+    parser.add_argument('--no-seed', action='store_true',
+                        help='reuse the data of a previous run')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='requests per scenario (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='concurrent clients (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='untimed requests per scenario '
+                             '(default: %(default)s)')
+    parser.add_argument('--driver', choices=sorted(DRIVERS) + ['all'],
+                        default='all', help='default: %(default)s')
+    parser.add_argument('--scenario', action='append',
+                        help='run only this scenario; may be repeated')
+    parser.add_argument('--serialize-rows', type=int, default=10000,
+                        help='questions encoded by the serialization '
+                             'comparison; 0 skips it (default: %(default)s)')
+    parser.add_argument('--draw-questions', type=int, default=1000000,
+                        help='question ids the quiz draw comparison picks '
+                             'from; 0 skips it (default: %(default)s)')
+    parser.add_argument('--output', help='write the JSON report here too')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+    with app.app_context():
+        if args.no_seed:
+            from models import Category, Question
+            category_ids = [c.id for c in Category.query.all()]
+            questions = Question.query.count()
+        else:
+            category_ids = seed(args.questions)
+            questions = args.questions
+        serialization = compare(app, args.serialize_rows) \
+            if args.serialize_rows else None
+
+    requests = scenarios(questions, category_ids)
+    names = args.scenario or list(requests)
+    drivers = sorted(DRIVERS) if args.driver == 'all' else [args.driver]
+    report = {
+        'commit': git_commit(),
+        'config': {
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+            'questions': questions,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+        },
+        'serialization': serialization,
+        'quiz_draw': draw.compare(args.draw_questions)
+        if args.draw_questions else None,
+        'results': {},
+    }
+    for driver_name in drivers:
+        with DRIVERS[driver_name](app) as driver:
+            report['results'][driver_name] = {
+                name: run(driver, requests[name], args.requests,
+                          args.concurrency, args.warmup)
+                for name in names
+            }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
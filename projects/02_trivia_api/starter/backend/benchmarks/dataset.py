@@ -0,0 +1,35 @@
+import random
+
+from models import Category, Question, db
+
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment',
+              'Sports')
+# Question text is drawn from these, so searches for them always match.
+WORDS = ('river', 'painting', 'mountain', 'empire', 'movie', 'football',
+         'planet', 'poet', 'island', 'battle', 'album', 'olympics', 'atom',
+         'sculpture', 'desert', 'king', 'actor', 'tennis', 'cell', 'museum')
+
+
+def seed(questions, chunk_size=10000, rng=None):
+    '''Replace the database's content with `questions` synthetic questions.
+
+    Must run in an app context. Returns the category ids.
+    '''
+    rng = rng or random.Random(0)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Category.__table__.insert(),
+                       [{'type': name} for name in CATEGORIES])
+    category_ids = [id for id, in db.session.query(Category.id)]
+    for start in range(0, questions, chunk_size):
+        db.session.execute(Question.__table__.insert(), [
+            {
+                'question': 'Which {} is {} {}?'.format(*rng.sample(WORDS, 3)),
+                'answer': rng.choice(WORDS),
+                'category': rng.choice(category_ids),
+                'difficulty': rng.randint(1, 5),
+            }
+            for _ in range(start, min(start + chunk_size, questions))
+        ])
+    db.session.commit()
+    return category_ids
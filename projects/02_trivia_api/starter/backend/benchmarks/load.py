@@ -0,0 +1,179 @@
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from flaskr import QUESTIONS_PER_PAGE
+from .dataset import WORDS
+
+QUIZ_PREVIOUS_QUESTIONS = 5
+
+
+def scenarios(questions, category_ids):
+    '''Request factories by name; each returns (method, path, json body).'''
+    pages = max(1, math.ceil(questions / QUESTIONS_PER_PAGE))
+    category_pages = max(1, pages // len(category_ids))
+
+    def questions_page(rng):
+        return 'GET', '/questions?page={}'.format(rng.randint(1, pages)), None
+
+    def search(rng):
+        return 'POST', '/questions/search', {'searchTerm': rng.choice(WORDS)}
+
+    def category_questions(rng):
+        return 'GET', '/categories/{}/questions?page={}'.format(
+            rng.choice(category_ids), rng.randint(1, category_pages)), None
+
+    def quiz(rng):
+        return 'POST', '/quizzes', {
+            'previous_questions': [
+                rng.randint(1, questions)
+                for _ in range(QUIZ_PREVIOUS_QUESTIONS)
+            ],
+            'quiz_category': {'id': rng.choice([0] + list(category_ids))},
+        }
+
+    return {
+        'questions': questions_page,
+        'search': search,
+        'category_questions': category_questions,
+        'quizzes': quiz,
+    }
+
+
+class ClientDriver:
+    '''Sends requests through Flask's test client, in this process.'''
+
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def send(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        return client.open(path, method=method, json=body).status_code
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    '''Skips the access log, which would otherwise dominate the timings.'''
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerDriver:
+    '''Sends HTTP requests to the app served by a local threaded server.'''
+
+    name = 'server'
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.base_url = 'http://{}:{}'.format(host, self.server.server_port)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.thread.join()
+
+    def send(self, method, path, body):
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+# percentile, summarize and _ms are the canonical versions; the coffee
+# shop's benchmarks/load.py copies them and its test_auth.py checks that
+# the copies match.
+def percentile(values, fraction):
+    '''Nearest-rank percentile of sorted `values`.'''
+    if not values:
+        return None
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    '''Latency percentiles (milliseconds) and throughput of one run.'''
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1) if elapsed else None,
+        'mean_ms': round(1000 * sum(latencies) / count, 3) if count else None,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(1000 * seconds, 3)
+
+
+def run(driver, make_request, requests, concurrency, warmup=0, seed=0):
+    '''Send `requests` requests from `concurrency` threads and summarize.
+
+    Only 5xx responses and exceptions count as errors: a 4xx, such as a
+    quiz that ran out of questions, is still a valid API response.
+    '''
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        driver.send(*make_request(rng))
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random('{}-{}'.format(seed, index))
+        share = requests // concurrency + (index < requests % concurrency)
+        timings, failed = [], 0
+        for _ in range(share):
+            method, path, body = make_request(rng)
+            start = time.perf_counter()
+            try:
+                status = driver.send(method, path, body)
+            except Exception:
+                status = None
+            timings.append(time.perf_counter() - start)
+            if status is None or status >= 500:
+                failed += 1
+        with lock:
+            latencies.extend(timings)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
@@ -0,0 +1,33 @@
+import time
+
+from flask import jsonify
+
+from flaskr import question_rows
+from models import Question
+
+
+def compare(app, rows):
+    '''Milliseconds to encode `rows` questions both ways.
+
+    `orm_jsonify` loads Question objects, calls format() on each and
+    encodes with jsonify, as the routes used to; `tuple_provider` builds
+    the rows from result tuples and encodes them with the app's JSON
+    provider. Must run in an app context.
+    '''
+    provider = app.extensions['json_provider']
+    query = Question.query.order_by(Question.id).limit(rows)
+
+    start = time.perf_counter()
+    with app.test_request_context():
+        jsonify({'questions': [q.format() for q in query]})
+    orm_jsonify = time.perf_counter() - start
+
+    start = time.perf_counter()
+    provider.dumps({'questions': question_rows(query)})
+    tuple_provider = time.perf_counter() - start
+
+    return {
+        'rows': min(rows, query.count()),
+        'orm_jsonify_ms': round(1000 * orm_jsonify, 3),
+        'tuple_provider_ms': round(1000 * tuple_provider, 3),
+    }
@@ -1,24 +1,221 @@
+import hashlib
+import json
 import os
-import random
+import time
+import weakref
 
-from flask import Flask, abort, jsonify, request
+import click
+from flask import Flask, abort, request
+from flask.cli import AppGroup
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, false
+from sqlalchemy.orm import Session, object_session
 
 from models import Category, Question, setup_db
+from .bulk import (InvalidRow, dump_questions, file_format, load_questions,
+                   read_rows, write_rows)
+from .json_provider import JSONProvider
+from .quiz import ALL_CATEGORIES, QuizSessions, draw, load_question_ids
 
 QUESTIONS_PER_PAGE = 10
+QUESTION_FIELDS = ('id', 'question', 'answer', 'category', 'difficulty')
+QUESTION_CACHE_TTL = 30
+CATEGORY_CACHE_TTL = 5 * 60
+MAX_BATCH_SIZE = 1000
+
+
+class CachedValue:
+    '''A value computed from the database at most every `ttl` seconds.
+
+    Writes made through this app call `invalidate()`; the TTL bounds how long
+    writes made elsewhere can go unnoticed.
+    '''
+
+    def __init__(self, compute, ttl=QUESTION_CACHE_TTL, clock=time.monotonic):
+        self.compute = compute
+        self.ttl = ttl
+        self.clock = clock
+        self.value = None
+        self.expires_at = 0
+
+    def get(self):
+        if self.value is None or self.clock() >= self.expires_at:
+            self.value = self.compute()
+            self.expires_at = self.clock() + self.ttl
+        return self.value
+
+    def invalidate(self):
+        self.value = None
+
+
+# Every app's category cache, so that a change to any Category reaches them.
+_category_caches = weakref.WeakSet()
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def category_changed(mapper, connection, target):
+    # Flushed, not committed yet: a reload now would still see the old
+    # rows, so only invalidate once the transaction commits.
+    session = object_session(target)
+    if session is not None:
+        session.info['categories_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_changed_categories(session):
+    if session.info.pop('categories_changed', False):
+        invalidate_categories()
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_categories(session):
+    session.info.pop('categories_changed', None)
+
+
+def invalidate_categories():
+    for cache in _category_caches:
+        cache.invalidate()
+
+
+def load_categories():
+    '''The {id: type} category map and an ETag for its JSON.'''
+    categories = {c.id: c.type for c in Category.query.all()}
+    body = json.dumps(categories, sort_keys=True).encode()
+    return categories, hashlib.sha1(body).hexdigest()
+
+
+def question_rows(query):
+    '''Question.format() dicts built straight from result tuples.
+
+    Only the formatted columns are selected and no Question objects are
+    created, which is most of the cost of a large page.
+    '''
+    columns = [getattr(Question, field) for field in QUESTION_FIELDS]
+    return [dict(zip(QUESTION_FIELDS, row))
+            for row in query.with_entities(*columns)]
+
+
+def paginate(query, page=1, after=None, per_page=QUESTIONS_PER_PAGE, extra=0):
+    '''The query for one page of `query`, ordered by question id.
+
+    With `after` (the id of the last question already seen) the page starts
+    right after it, which costs the same for every page. Otherwise the page
+    number is turned into an OFFSET on the primary key index, and only the
+    ids of the skipped rows are read. `extra` rows past the end of the page
+    are included as well.
+    '''
+    query = query.order_by(Question.id)
+    if after is not None:
+        return query.filter(Question.id > after).limit(per_page + extra)
+    if page < 1:
+        return query.filter(false())
+    page_ids = query.with_entities(Question.id).offset(
+        (page - 1) * per_page).limit(per_page + extra).subquery()
+    return query.join(page_ids, Question.id == page_ids.c.id)
+
+
+def question_page(query, page=1, after=None, per_page=QUESTIONS_PER_PAGE):
+    '''One page of question_rows and the cursor of the next page.
+
+    One row past the page is read to tell whether another page follows;
+    the cursor is None on the last page.
+    '''
+    rows = question_rows(paginate(query, page, after, per_page, extra=1))
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, rows[-1]['id']
+
+
+def escape_like(term):
+    '''Escape LIKE wildcards so `term` only ever matches itself.'''
+    return (term.replace('\\', '\\\\')
+            .replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+trivia_cli = AppGroup('trivia', help='Trivia maintenance commands.')
+
+
+def _file_format(path):
+    try:
+        return file_format(path)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PATH')
+
+
+def _report(label, count, elapsed):
+    rate = count / elapsed if elapsed else count
+    click.echo('{}: {} rows in {:.2f}s ({:.0f} rows/sec)'.format(
+        label, count, elapsed, rate))
+
+
+@trivia_cli.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows per INSERT batch and transaction.')
+def load_command(path, chunk_size):
+    """Add the questions of a CSV or NDJSON file."""
+    format = _file_format(path)
+    start = time.perf_counter()
+    with open(path, newline='') as fh:
+        try:
+            count = load_questions(read_rows(fh, format), chunk_size)
+        except InvalidRow as e:
+            loaded = (e.number - 1) // chunk_size * chunk_size
+            raise click.ClickException(
+                '{}; the first {} rows were loaded'.format(e, loaded))
+    _report('questions', count, time.perf_counter() - start)
+
+
+@trivia_cli.command('dump')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows fetched per round trip.')
+def dump_command(path, chunk_size):
+    """Write every question to a CSV or NDJSON file."""
+    format = _file_format(path)
+    start = time.perf_counter()
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with open(path, 'w', newline='') as fh:
+        write_rows(fh, counted(dump_questions(chunk_size)), format)
+    _report('questions', count, time.perf_counter() - start)
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    test_config = test_config or {}
+    if 'SQLALCHEMY_DATABASE_URI' in test_config:
+        setup_db(app, test_config['SQLALCHEMY_DATABASE_URI'])
+    else:
+        setup_db(app)
+    app.config.from_mapping(test_config)
     '''
     @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after
     completing the TODOs
     '''
     CORS(app, resources={r"/*": {"origins": "*"}})
+    provider = JSONProvider(app)
+    app.cli.add_command(trivia_cli)
+    question_count = CachedValue(lambda: Question.query.count())
+    question_ids = CachedValue(load_question_ids)
+    category_map = CachedValue(load_categories, ttl=CATEGORY_CACHE_TTL)
+    _category_caches.add(category_map)
+    quiz_sessions = QuizSessions()
+    # Tests share one app and reset these between cases.
+    app.extensions['trivia_caches'] = (
+        question_count, question_ids, category_map)
 
     '''
     @TODO: Use the after_request decorator to set Access-Control-Allow
@@ -39,11 +236,14 @@ def create_app(test_config=None):
         Create an endpoint to handle GET requests
         for all available categories.
         '''
-        categories = Category.query.all()
-        all_categories = {c.id: c.type for c in categories}
-        return jsonify({
+        all_categories, etag = category_map.get()
+        response = provider.response({
             "categories": all_categories
         })
+        response.set_etag(etag)
+        # Let clients and proxies keep the body but ask before using it.
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     @app.route('/questions', methods=['GET'])
     def questions():
@@ -61,20 +261,19 @@ def create_app(test_config=None):
         Clicking on the page numbers should update the questions.
         '''
         page = request.args.get('page', 1, type=int)
-        start = (page - 1) * QUESTIONS_PER_PAGE
-        end = start + QUESTIONS_PER_PAGE
-        questions = Question.query.all()
-        current_questions = [q.format() for q in questions[start:end]]
+        after = request.args.get('after', type=int)
+        current_questions, next_cursor = question_page(
+            Question.query, page, after)
         if not current_questions:
             abort(404)
 
-        categories = Category.query.all()
-        all_categories = {c.id: c.type for c in categories}
-        return jsonify({
+        all_categories, _ = category_map.get()
+        return provider.response({
             "questions": current_questions,
-            "total_questions": len(questions),
+            "total_questions": question_count.get(),
             "categories": all_categories,
             "current_category": None,
+            "next_cursor": next_cursor,
         })
 
     @app.route('/questions/<int:question_id>', methods=['DELETE'])
@@ -93,7 +292,9 @@ def create_app(test_config=None):
         except:
             abort(422)
         else:
-            return jsonify({}), 204
+            question_count.invalidate()
+            question_ids.invalidate()
+            return provider.response({}), 204
 
     @app.route('/questions', methods=['POST'])
     def add_question():
@@ -115,7 +316,28 @@ def create_app(test_config=None):
             category=data['category'],
         )
         q.insert()
-        return jsonify({}), 201
+        question_count.invalidate()
+        question_ids.invalidate()
+        return provider.response({}), 201
+
+    @app.route('/questions/batch', methods=['POST'])
+    def add_questions():
+        '''Add up to MAX_BATCH_SIZE questions in a single transaction.'''
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            abort(400)
+        rows = body.get('questions')
+        if not isinstance(rows, list) or not rows:
+            abort(400)
+        if len(rows) > MAX_BATCH_SIZE:
+            abort(413)
+        try:
+            count = load_questions(rows, chunk_size=MAX_BATCH_SIZE)
+        except InvalidRow as e:
+            abort(422, description=str(e))
+        question_count.invalidate()
+        question_ids.invalidate()
+        return provider.response({"inserted": count}), 201
 
     @app.route('/questions/search', methods=['POST'])
     def search():
@@ -129,17 +351,35 @@ def create_app(test_config=None):
         only question that include that string within their question.
         Try using the word "title" to start.
         '''
-        questions = Question.query.all()
-        search_term = request.json["searchTerm"]
-        current_questions = [
-            question.format() for question in questions
-            if search_term.lower() in question.question.lower()
-        ]
-
-        return jsonify({
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            abort(400)
+        search_term = body.get('searchTerm')
+        if not isinstance(search_term, str):
+            abort(400)
+        page = request.args.get('page', 1, type=int)
+        after = request.args.get('after', type=int)
+        category = body.get('category')
+        if category in (None, ''):
+            category = None
+        else:
+            try:
+                category = int(category)
+            except (TypeError, ValueError):
+                abort(400)
+
+        # ILIKE '%term%' is answered by the trigram index on PostgreSQL.
+        query = Question.query.filter(Question.question.ilike(
+            '%{}%'.format(escape_like(search_term)), escape='\\'))
+        if category is not None:
+            query = query.filter(Question.category == category)
+        current_questions, next_cursor = question_page(query, page, after)
+
+        return provider.response({
             "questions": current_questions,
-            "total_questions": len(questions),
-            "current_category": None,
+            "total_questions": query.count(),
+            "current_category": category,
+            "next_cursor": next_cursor,
         })
 
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
@@ -152,17 +392,18 @@ def create_app(test_config=None):
         categories in the left column will cause only questions of that
         category to be shown.
         '''
-        category = Category.query.get_or_404(category_id)
-        questions = Question.query.all()
-        current_questions = [
-            question.format() for question in questions
-            if question.category == category.id
-        ]
-
-        return jsonify({
+        if category_id not in category_map.get()[0]:
+            abort(404)
+        page = request.args.get('page', 1, type=int)
+        after = request.args.get('after', type=int)
+        query = Question.query.filter(Question.category == category_id)
+        current_questions, next_cursor = question_page(query, page, after)
+
+        return provider.response({
             "questions": current_questions,
-            "total_questions": len(current_questions),
+            "total_questions": query.count(),
             "current_category": category_id,
+            "next_cursor": next_cursor,
         }), 200
 
     @app.route('/quizzes', methods=['POST'])
@@ -179,35 +420,72 @@ def create_app(test_config=None):
         and shown whether they were correct or not.
         '''
         try:
-            previous_questions = request.json["previous_questions"]
+            previous_questions = set(request.json["previous_questions"])
             category_id = int(request.json["quiz_category"]["id"])
-            questions = Question.query.all()
-            if category_id == 0:
-                category_questions = questions
-            else:
-                category_questions = [
-                    q for q in questions if q.category == int(category_id)
-                ]
-
-            new_questions = [
-                q for q in category_questions if q.id not in previous_questions
-            ]
-
-            random_question = random.choice(new_questions)
         except:
             abort(422)
 
-        return jsonify({
+        question_id = draw(question_ids.get().get(category_id, ()),
+                           previous_questions)
+        if question_id is None:
+            abort(422)
+        random_question = Question.query.get(question_id)
+        if random_question is None:
+            # Deleted outside this app; reload the ids on the next draw.
+            question_ids.invalidate()
+            abort(422)
+
+        return provider.response({
             "question": random_question.format(),
         }), 200
 
+    def next_quiz_question(token):
+        try:
+            while True:
+                question_id, remaining = quiz_sessions.next(token)
+                if question_id is None:
+                    return None, 0
+                # Skip questions deleted since the game started.
+                question = Question.query.get(question_id)
+                if question is not None:
+                    return question.format(), remaining
+        except KeyError:
+            abort(404)
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz():
+        '''Shuffle the category's questions once and return the first one.'''
+        try:
+            category_id = int(request.json["quiz_category"]["id"])
+        except:
+            abort(422)
+        if (category_id != ALL_CATEGORIES
+                and category_id not in category_map.get()[0]):
+            abort(404)
+
+        token = quiz_sessions.start(question_ids.get().get(category_id, ()))
+        question, remaining = next_quiz_question(token)
+        return provider.response({
+            "session_token": token,
+            "question": question,
+            "remaining_questions": remaining,
+        }), 201
+
+    @app.route('/quizzes/sessions/<token>/next', methods=['POST'])
+    def next_quiz(token):
+        question, remaining = next_quiz_question(token)
+        return provider.response({
+            "question": question,
+            "remaining_questions": remaining,
+        }), 200
+
     '''
     @TODO:
     Create error handlers for all expected errors
     including 404 and 422.
     '''
     def error_handler(status, error):
-        return jsonify({
+        return provider.response({
             "success": False,
             "error": status,
             "message": str(error)
@@ -225,6 +503,10 @@ def create_app(test_config=None):
     def method_not_allowed(error):
         return error_handler(405, error)
 
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return error_handler(413, error)
+
     @app.errorhandler(422)
     def unprocessable_entity(error):
         return error_handler(422, error)
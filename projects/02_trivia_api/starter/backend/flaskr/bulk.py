@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from sqlalchemy import select
+
+from models import Category, Question, db
+
+FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+# Columns read by `flask trivia load`; `dump` writes the id as well.
+LOAD_FIELDS = ('question', 'answer', 'category', 'difficulty')
+DUMP_FIELDS = ('id',) + LOAD_FIELDS
+DIFFICULTIES = range(1, 6)
+
+
+# InvalidRow, file_format, read_rows and chunked follow Fyyur's bulk.py,
+# which holds the canonical versions. Change both together.
+class InvalidRow(ValueError):
+    '''A question row that cannot be loaded; `number` counts from 1.'''
+
+    def __init__(self, number, message):
+        super().__init__('row {}: {}'.format(number, message))
+        self.number = number
+
+
+def file_format(path):
+    '''Return 'csv' or 'ndjson' depending on the file extension.'''
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError('Unsupported file type {!r}, expected one of {}'
+                         .format(extension, ', '.join(FORMATS)))
+    return FORMATS[extension]
+
+
+def read_rows(fh, format):
+    '''Yield one dict per row of a CSV or NDJSON file, one line at a time.
+
+    An NDJSON line that is not a JSON object raises InvalidRow.
+    '''
+    if format == 'csv':
+        yield from csv.DictReader(fh)
+        return
+    number = 0
+    for line in fh:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise InvalidRow(number, 'invalid JSON: {}'.format(e))
+        if not isinstance(row, dict):
+            raise InvalidRow(number, 'expected a JSON object')
+        yield row
+
+
+def write_rows(fh, rows, format):
+    '''Write question dicts to a CSV or NDJSON file, one row at a time.'''
+    if format == 'csv':
+        writer = csv.DictWriter(fh, fieldnames=DUMP_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for row in rows:
+        fh.write(json.dumps(row) + '\n')
+
+
+def chunked(iterable, size):
+    '''Yield lists of up to `size` items.'''
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate(row, number, category_ids):
+    '''The insert values for one question row, or InvalidRow.'''
+    if not isinstance(row, dict):
+        raise InvalidRow(number, 'expected a JSON object')
+    record = {}
+    for field in ('question', 'answer'):
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise InvalidRow(number, '{} is required'.format(field))
+        record[field] = value.strip()
+    for field in ('category', 'difficulty'):
+        try:
+            record[field] = int(row.get(field))
+        except (TypeError, ValueError):
+            raise InvalidRow(number, '{} must be a number'.format(field))
+    if record['category'] not in category_ids:
+        raise InvalidRow(number, 'unknown category {}'.format(
+            record['category']))
+    if record['difficulty'] not in DIFFICULTIES:
+        raise InvalidRow(number, 'difficulty must be between 1 and 5')
+    return record
+
+
+def load_questions(rows, chunk_size=1000):
+    '''Insert question rows, one transaction of `chunk_size` rows at a time.
+
+    Each chunk is validated as a whole before any of it is inserted, with a
+    single executemany. An InvalidRow stops the load; the chunks before it
+    stay committed. Returns the number of questions inserted.
+    '''
+    category_ids = {id for id, in db.session.query(Category.id)}
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        records = [
+            validate(row, count + number, category_ids)
+            for number, row in enumerate(chunk, 1)
+        ]
+        db.session.execute(Question.__table__.insert(), records)
+        db.session.commit()
+        count += len(records)
+    return count
+
+
+def dump_questions(chunk_size=1000):
+    '''Yield every question as a dict, reading `chunk_size` rows at a time.
+
+    The rows come from a server-side cursor, so memory use does not grow
+    with the table.
+    '''
+    columns = [Question.__table__.c[field] for field in DUMP_FIELDS]
+    result = db.session.execute(
+        select(columns).order_by(Question.id)
+        .execution_options(stream_results=True))
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(zip(DUMP_FIELDS, row))
@@ -0,0 +1,100 @@
+import random
+import secrets
+import time
+from array import array
+from collections import OrderedDict
+from threading import Lock
+
+from models import Question, db
+
+ALL_CATEGORIES = 0
+DRAW_ATTEMPTS = 32
+MAX_QUIZ_SESSIONS = 10000
+QUIZ_SESSION_TTL = 60 * 60
+
+
+def load_question_ids():
+    '''Question ids by category id, as compact arrays.
+
+    ALL_CATEGORIES (the id the frontend sends for "All") maps to every id.
+    Only the id and category columns are read.
+    '''
+    pool = {ALL_CATEGORIES: array('I')}
+    rows = db.session.query(Question.id, Question.category).order_by(
+        Question.id).yield_per(10000)
+    for question_id, category in rows:
+        pool[ALL_CATEGORIES].append(question_id)
+        if category is not None:
+            pool.setdefault(category, array('I')).append(question_id)
+    return pool
+
+
+def draw(ids, excluded, rng=random, attempts=DRAW_ATTEMPTS):
+    '''A random id from `ids` that is not in the set `excluded`, or None.
+
+    Picks random positions until one is not excluded, so a draw costs
+    O(1) while most of the ids are still unseen. Only when `attempts`
+    picks in a row were excluded are the remaining ids listed.
+    '''
+    if not ids:
+        return None
+    for _ in range(attempts):
+        candidate = ids[rng.randrange(len(ids))]
+        if candidate not in excluded:
+            return candidate
+    remaining = [i for i in ids if i not in excluded]
+    return rng.choice(remaining) if remaining else None
+
+
+class QuizSessions:
+    '''One shuffled deck of question ids per game, looked up by token.
+
+    A deck is an array('I') (4 bytes per question) that is shuffled once
+    when the game starts; every draw pops its last id. Games idle for
+    `ttl` seconds, and the least recently played ones beyond
+    `max_sessions`, are dropped.
+    '''
+
+    def __init__(self, max_sessions=MAX_QUIZ_SESSIONS, ttl=QUIZ_SESSION_TTL,
+                 clock=time.monotonic, rng=random):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self.rng = rng
+        self._decks = OrderedDict()
+        self._lock = Lock()
+
+    def start(self, ids):
+        deck = array('I', ids)
+        self.rng.shuffle(deck)
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._decks[token] = (self.clock() + self.ttl, deck)
+            self._evict()
+        return token
+
+    def next(self, token):
+        '''Pop the game's next id; return it with the number left after it.
+
+        The id is None once the deck is used up. Raises KeyError for
+        unknown or expired tokens.
+        '''
+        with self._lock:
+            expires_at, deck = self._decks[token]
+            if expires_at <= self.clock():
+                del self._decks[token]
+                raise KeyError(token)
+            if not deck:
+                del self._decks[token]
+                return None, 0
+            self._decks[token] = (self.clock() + self.ttl, deck)
+            self._decks.move_to_end(token)
+            return deck.pop(), len(deck)
+
+    def _evict(self):
+        now = self.clock()
+        while self._decks:
+            token, (expires_at, _) = next(iter(self._decks.items()))
+            if expires_at > now and len(self._decks) <= self.max_sessions:
+                return
+            del self._decks[token]
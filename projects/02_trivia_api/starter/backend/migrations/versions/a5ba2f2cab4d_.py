@@ -0,0 +1,64 @@
+"""questions.category as an indexed foreign key
+
+Revision ID: a5ba2f2cab4d
+Revises: dca37f3bb383
+Create Date: 2020-03-08 11:24:50.671903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5ba2f2cab4d'
+down_revision = 'dca37f3bb383'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name']: c['type'] for c in inspector.get_columns('questions')}
+
+    # trivia.psql already stores category ids as integers. Tables built by
+    # setup_db's create_all stored them as text, possibly as category names.
+    if not isinstance(columns['category'], sa.Integer):
+        op.execute(
+            'UPDATE questions SET category = ('
+            'SELECT CAST(categories.id AS VARCHAR) FROM categories '
+            'WHERE categories.type = questions.category) '
+            'WHERE category IN (SELECT type FROM categories)'
+        )
+    op.execute(
+        'UPDATE questions SET category = NULL '
+        'WHERE CAST(category AS VARCHAR) NOT IN '
+        '(SELECT CAST(id AS VARCHAR) FROM categories)'
+    )
+
+    foreign_keys = [
+        fk['name'] for fk in inspector.get_foreign_keys('questions')
+        if fk['constrained_columns'] == ['category'] and fk['name']
+    ]
+    with op.batch_alter_table('questions') as batch_op:
+        for name in foreign_keys:
+            batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.alter_column(
+            'category', type_=sa.Integer(),
+            postgresql_using='category::integer')
+        batch_op.create_foreign_key(
+            'fk_questions_category_categories', 'categories',
+            ['category'], ['id'], onupdate='CASCADE', ondelete='SET NULL')
+        batch_op.create_index(
+            'ix_questions_category', ['category', 'id'], unique=False)
+
+
+def downgrade():
+    # The column stays an integer: that is what trivia.psql creates.
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_index('ix_questions_category')
+        batch_op.drop_constraint(
+            'fk_questions_category_categories', type_='foreignkey')
+        batch_op.create_foreign_key(
+            'category', 'categories', ['category'], ['id'],
+            onupdate='CASCADE', ondelete='SET NULL')
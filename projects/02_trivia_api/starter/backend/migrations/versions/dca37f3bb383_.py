@@ -0,0 +1,36 @@
+"""trigram index on question text
+
+Revision ID: dca37f3bb383
+Revises: 
+Create Date: 2020-03-01 14:06:21.318254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dca37f3bb383'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The questions table comes from trivia.psql (or setup_db's create_all).
+    # Trigram indexes only exist on PostgreSQL; elsewhere the ILIKE in
+    # /questions/search falls back to a scan.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_questions_question_trgm', 'questions', ['question'],
+        postgresql_using='gin',
+        postgresql_ops={'question': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_questions_question_trgm', table_name='questions')
@@ -1,35 +1,186 @@
 import os
+import sqlite3
+import tempfile
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+from array import array
+from unittest import mock
+from flask import Flask, jsonify, request
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 
-from flaskr import create_app
-from models import setup_db, Question, Category
+from benchmarks.load import summarize
+from flaskr import create_app, question_rows
+from flaskr.json_provider import JSONProvider
+from flaskr.quiz import QuizSessions, draw
+from models import db, Question, Category
+
+# In-memory SQLite by default; point this at PostgreSQL (for instance
+# postgresql:///trivia_test) to run against the real database.
+DATABASE_URL = os.environ.get('TRIVIA_TEST_DATABASE_URL', 'sqlite://')
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'trivia.psql')
 
 QUESTIONS_PER_PAGE = 10
 
 
+class QuizDrawTestCase(unittest.TestCase):
+    """Draws from an id array, without a database"""
+
+    def test_never_draws_excluded_ids(self):
+        ids = array('I', range(1, 11))
+        excluded = set(range(1, 10))
+        for _ in range(20):
+            self.assertEqual(draw(ids, excluded), 10)
+        self.assertIsNone(draw(ids, excluded | {10}))
+        self.assertIsNone(draw(array('I'), set()))
+
+
+class QuizSessionsTestCase(unittest.TestCase):
+    """Shuffled decks kept in memory"""
+
+    def setUp(self):
+        self.now = 0
+        self.sessions = QuizSessions(max_sessions=2, ttl=10,
+                                     clock=lambda: self.now)
+
+    def test_deals_every_id_once(self):
+        token = self.sessions.start(range(1, 6))
+        dealt = [self.sessions.next(token) for _ in range(6)]
+        self.assertEqual(sorted(i for i, _ in dealt[:5]), [1, 2, 3, 4, 5])
+        self.assertEqual([left for _, left in dealt], [4, 3, 2, 1, 0, 0])
+        self.assertEqual(dealt[5], (None, 0))
+
+    def test_drops_idle_and_least_recently_played_games(self):
+        first = self.sessions.start([1])
+        self.now = 5
+        second = self.sessions.start([1])
+        self.now = 12
+        self.assertRaises(KeyError, self.sessions.next, first)
+        third = self.sessions.start([1, 2])
+        self.sessions.next(third)
+        self.sessions.start([1])
+        self.assertRaises(KeyError, self.sessions.next, second)
+        self.assertEqual(self.sessions.next(third)[1], 0)
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_connect(dbapi_connection, connection_record):
+    # pysqlite's own transaction handling breaks SAVEPOINTs; let
+    # SQLAlchemy emit BEGIN itself instead.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.isolation_level = None
+
+
+@event.listens_for(Engine, 'begin')
+def _sqlite_begin(connection):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text('BEGIN'))
+
+
+def read_fixture(path=FIXTURE_PATH):
+    """Rows of the COPY blocks of a pg_dump file, by table"""
+    tables = {}
+    rows = None
+    with open(path) as fh:
+        for line in fh:
+            line = line.rstrip('\n')
+            if line.startswith('COPY public.'):
+                table, columns = line[len('COPY public.'):].split(' ', 1)
+                columns = columns.split(')')[0].strip('(').split(', ')
+                rows = tables[table] = []
+            elif line == '\\.':
+                rows = None
+            elif rows is not None:
+                rows.append({
+                    column: None if value == '\\N' else value
+                    for column, value in zip(columns, line.split('\t'))
+                })
+    return tables
+
+
+app = None
+
+
+def setUpModule():
+    """Create the app, its schema and the trivia.psql data once"""
+    global app
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': DATABASE_URL})
+    with app.app_context():
+        if Category.query.count() == 0:
+            fixture = read_fixture()
+            for model in (Category, Question):
+                db.session.execute(model.__table__.insert(),
+                                   fixture[model.__tablename__])
+                if db.engine.dialect.name == 'postgresql':
+                    db.session.execute(text(
+                        "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+                        "(SELECT max(id) FROM {0}))".format(
+                            model.__tablename__)))
+            db.session.commit()
+        db.session.remove()
+
+
+class BenchmarkReportTestCase(unittest.TestCase):
+    """Latency percentiles reported by python -m benchmarks"""
+
+    def test_summarize(self):
+        latencies = [i / 1000 for i in range(100, 0, -1)]
+        report = summarize(latencies, errors=2, elapsed=0.5)
+        self.assertEqual(report['requests'], 100)
+        self.assertEqual(report['errors'], 2)
+        self.assertEqual(report['throughput_rps'], 200)
+        self.assertEqual(
+            (report['p50_ms'], report['p95_ms'], report['p99_ms']),
+            (50, 95, 99))
+        self.assertIsNone(summarize([], 0, 0)['p99_ms'])
+
+
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Run the test in a transaction that tearDown rolls back.
+
+        Commits made by the app only release a SAVEPOINT, which is started
+        again straight away, so nothing a test writes is ever kept.
+        """
+        self.app = app
         self.client = self.app.test_client
-        self.database_name = "trivia_test"
-        self.database_path = "postgresql:///{}".format(self.database_name)
-        setup_db(self.app, self.database_path)
+        # One app context for the whole test keeps the session alive
+        # between requests.
+        self.context = self.app.app_context()
+        self.context.push()
+
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        self.app_session = db.session
+        db.session = db.create_scoped_session(
+            options={'bind': self.connection, 'binds': {}})
+        self.session = db.session()
+        self.session.begin_nested()
+        event.listen(self.session, 'after_transaction_end',
+                     self.restart_savepoint)
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
+        for cache in self.app.extensions['trivia_caches']:
+            cache.invalidate()
+
+    @staticmethod
+    def restart_savepoint(session, transaction):
+        if transaction.nested and not transaction._parent.nested:
+            session.expire_all()
+            session.begin_nested()
 
     def tearDown(self):
         """Executed after reach test"""
-        pass
+        # Roll back to the outer transaction, without a new SAVEPOINT.
+        event.remove(self.session, 'after_transaction_end',
+                     self.restart_savepoint)
+        db.session.rollback()
+        db.session.remove()
+        db.session = self.app_session
+        self.transaction.rollback()
+        self.connection.close()
+        self.context.pop()
 
     """
     TODO
@@ -43,6 +194,39 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertGreater(len(data['categories']), 0)
 
+    def test_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_categories_cache_sees_new_categories(self):
+        before = self.client().get('/categories')
+        category = Category(type='Music')
+        db.session.add(category)
+        db.session.commit()
+
+        after = self.client().get('/categories')
+        self.assertEqual(after.json['categories'][str(category.id)], 'Music')
+        self.assertNotEqual(after.headers['ETag'], before.headers['ETag'])
+
+    def test_categories_cache_waits_for_commit(self):
+        before = self.client().get('/categories')
+        category = Category(type='Music')
+        db.session.add(category)
+        db.session.flush()
+
+        during = self.client().get('/categories')
+        db.session.rollback()
+        after = self.client().get('/categories')
+
+        self.assertEqual(during.headers['ETag'], before.headers['ETag'])
+        self.assertEqual(after.headers['ETag'], before.headers['ETag'])
+        self.assertNotIn('categories_changed', db.session().info)
+
     def test_get_peginated_questions(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -58,6 +242,64 @@ class TriviaTestCase(unittest.TestCase):
         res = self.client().get('/questions?page=12')
         self.assertEqual(res.status_code, 404)
 
+    def test_questions_cursor(self):
+        """Following next_cursor continues right after the previous page"""
+        first = self.client().get('/questions').json
+        second = self.client().get(
+            '/questions?after={}'.format(first['next_cursor'])).json
+
+        ids = [q['id'] for q in first['questions'] + second['questions']]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            second['questions'],
+            self.client().get('/questions?page=2').json['questions'])
+
+    def test_following_cursors_reads_every_question_once(self):
+        data = self.client().get('/questions').json
+        ids = [q['id'] for q in data['questions']]
+        while data['next_cursor'] is not None:
+            self.assertEqual(data['next_cursor'], ids[-1])
+            res = self.client().get(
+                '/questions?after={}'.format(data['next_cursor']))
+            self.assertEqual(res.status_code, 200)
+            data = res.json
+            ids += [q['id'] for q in data['questions']]
+
+        self.assertEqual(
+            ids, [q.id for q in Question.query.order_by(Question.id)])
+        self.assertEqual(len(ids), data['total_questions'])
+
+    def test_questions_cursor_past_the_end(self):
+        res = self.client().get('/questions?after=100000')
+        self.assertEqual(res.status_code, 404)
+
+    def test_tuple_rows_match_orm_rows(self):
+        """Rows built from tuples encode the same as Question.format()"""
+        query = Question.query.order_by(Question.id)
+        provider = self.app.extensions['json_provider']
+
+        rows = question_rows(query)
+        self.assertEqual(rows, [q.format() for q in query])
+        with self.app.test_request_context():
+            expected = jsonify({"questions": rows}).get_json()
+        self.assertEqual(json.loads(provider.dumps({"questions": rows})),
+                         expected)
+
+    def test_json_provider_leaves_flask_json_alone(self):
+        provider = self.app.extensions['json_provider']
+        self.assertIsNot(getattr(self.app, 'json', None), provider)
+        with self.app.test_request_context(json={"searchTerm": "title"}):
+            self.assertEqual(request.get_json(), {"searchTerm": "title"})
+
+    def test_json_provider_follows_use_orjson_setting(self):
+        plain = Flask(__name__)
+        plain.config['USE_ORJSON'] = False
+        provider = JSONProvider(plain)
+        self.assertFalse(provider.use_orjson)
+        self.assertIs(plain.extensions['json_provider'], provider)
+        self.assertEqual(provider.dumps({1: 'Science'}), '{"1":"Science"}')
+
     def test_delete_question(self):
         res = self.client().delete('/questions/5')
         self.assertEqual(res.status_code, 204)
@@ -77,6 +319,91 @@ class TriviaTestCase(unittest.TestCase):
         res = self.client().post('/questions', json=new_question)
         self.assertEqual(res.status_code, 201)
 
+    def test_add_questions_in_batch(self):
+        total = self.client().get('/questions').json["total_questions"]
+        new_questions = [{
+            "question": "Batch question {}".format(i),
+            "answer": "Answer",
+            "difficulty": 2,
+            "category": 3,
+        } for i in range(3)]
+        res = self.client().post('/questions/batch',
+                                 json={"questions": new_questions})
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json["inserted"], 3)
+        self.assertEqual(
+            self.client().get('/questions').json["total_questions"], total + 3)
+
+    def test_add_questions_in_batch_is_all_or_nothing(self):
+        total = self.client().get('/questions').json["total_questions"]
+        new_questions = [
+            {"question": "Q", "answer": "A", "difficulty": 2, "category": 3},
+            {"question": "Q", "answer": "A", "difficulty": 7, "category": 3},
+        ]
+        res = self.client().post('/questions/batch',
+                                 json={"questions": new_questions})
+
+        self.assertEqual(res.status_code, 422)
+        self.assertIn("row 2", res.json["message"])
+        self.assertEqual(
+            self.client().get('/questions').json["total_questions"], total)
+
+    def test_add_questions_in_batch_rejects_malformed_input(self):
+        res = self.client().post('/questions/batch', json=[{"question": "Q"}])
+        self.assertEqual(res.status_code, 400)
+
+        res = self.client().post('/questions/batch', json={"questions": [
+            {"question": "Q", "answer": "A", "difficulty": 2, "category": 3},
+            1,
+        ]})
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(res.json["message"],
+                         "422 Unprocessable Entity: row 2: expected a JSON object")
+
+    def test_dump_and_load_questions(self):
+        runner = self.app.test_cli_runner()
+        # The commands run in their own app context, whose teardown would
+        # otherwise close the test's session.
+        with mock.patch.object(db.session, 'remove'), \
+                tempfile.TemporaryDirectory() as directory:
+            dump = os.path.join(directory, 'questions.ndjson')
+            result = runner.invoke(args=['trivia', 'dump', dump])
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(dump) as fh:
+                dumped = [json.loads(line) for line in fh]
+            self.assertGreater(len(dumped), 0)
+
+            load = os.path.join(directory, 'questions.csv')
+            with open(load, 'w') as fh:
+                fh.write('question,answer,category,difficulty\n'
+                         'Loaded question,Answer,1,1\n')
+            result = runner.invoke(args=['trivia', 'load', load])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('questions: 1 rows', result.output)
+
+    def test_load_questions_reports_bad_input(self):
+        runner = self.app.test_cli_runner()
+        with mock.patch.object(db.session, 'remove'), \
+                tempfile.TemporaryDirectory() as directory:
+            unsupported = os.path.join(directory, 'questions.txt')
+            malformed = os.path.join(directory, 'questions.ndjson')
+            for path in (unsupported, malformed):
+                with open(path, 'w') as fh:
+                    fh.write('{"question": "Q", "answer": "A", '
+                             '"category": 1, "difficulty": 1}\n[]\n')
+
+            result = runner.invoke(args=['trivia', 'load', unsupported])
+            self.assertEqual(result.exit_code, 2, result.output)
+            self.assertIn("Unsupported file type '.txt'", result.output)
+
+            result = runner.invoke(args=['trivia', 'dump', unsupported])
+            self.assertEqual(result.exit_code, 2, result.output)
+
+            result = runner.invoke(args=['trivia', 'load', malformed])
+            self.assertEqual(result.exit_code, 1, result.output)
+            self.assertIn('row 2: expected a JSON object', result.output)
+
     def test_search(self):
         """Get a question back when you search for 'mirrors'"""
         search_term = {
@@ -87,6 +414,52 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertGreater(len(data["questions"]), 0)
 
+    def test_search_is_case_insensitive_and_paginated(self):
+        res = self.client().post('/questions/search?page=1',
+                                 json={"searchTerm": "MIRRORS"})
+        data = res.json
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(len(data["questions"]), 0)
+        self.assertLessEqual(len(data["questions"]), QUESTIONS_PER_PAGE)
+        self.assertGreaterEqual(data["total_questions"], len(data["questions"]))
+        for question in data["questions"]:
+            self.assertIn("mirrors", question["question"].lower())
+
+    def test_search_in_category(self):
+        res = self.client().post('/questions/search',
+                                 json={"searchTerm": "", "category": 2})
+        data = res.json
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["current_category"], 2)
+        for question in data["questions"]:
+            self.assertEqual(question["category"], 2)
+
+    def test_search_wildcards_are_literal(self):
+        res = self.client().post('/questions/search',
+                                 json={"searchTerm": "%_%"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json["questions"], [])
+
+    def test_search_without_term(self):
+        res = self.client().post('/questions/search', json={})
+        self.assertEqual(res.status_code, 400)
+
+    def test_search_rejects_malformed_bodies(self):
+        for body in ([], {"searchTerm": 5}, {"searchTerm": None},
+                     {"searchTerm": "title", "category": "abc"},
+                     {"searchTerm": "title", "category": [1]}):
+            res = self.client().post('/questions/search', json=body)
+            self.assertEqual(res.status_code, 400, body)
+            self.assertFalse(res.json["success"])
+
+    def test_search_category_may_be_a_string(self):
+        res = self.client().post('/questions/search',
+                                 json={"searchTerm": "", "category": "2"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json["current_category"], 2)
+        for question in res.json["questions"]:
+            self.assertEqual(question["category"], 2)
+
     def test_questions_by_category(self):
         res = self.client().get('categories/1/questions')
         self.assertEqual(res.status_code, 200)
@@ -96,6 +469,26 @@ class TriviaTestCase(unittest.TestCase):
         for question in data["questions"]:
             self.assertEqual(question["category"], 1)
 
+    def test_questions_by_category_are_paginated(self):
+        Question.query.filter(Question.category == 1).delete()
+        db.session.add_all(
+            Question(question='Q{}'.format(i), answer='A', category=1,
+                     difficulty=1)
+            for i in range(QUESTIONS_PER_PAGE + 2))
+        db.session.commit()
+
+        first = self.client().get('categories/1/questions?page=1').json
+        rest = self.client().get('categories/1/questions?after={}'.format(
+            first["next_cursor"])).json
+
+        self.assertEqual(len(first["questions"]), QUESTIONS_PER_PAGE)
+        self.assertEqual(first["next_cursor"], first["questions"][-1]["id"])
+        self.assertEqual(len(rest["questions"]), 2)
+        self.assertIsNone(rest["next_cursor"])
+        self.assertEqual(first["total_questions"], QUESTIONS_PER_PAGE + 2)
+        ids = [q["id"] for q in first["questions"] + rest["questions"]]
+        self.assertEqual(ids, sorted(set(ids)))
+
     def test_questions_by_category_with_wrong_category(self):
         res = self.client().get('categories/130/questions')
         self.assertEqual(res.status_code, 404)
@@ -115,6 +508,38 @@ class TriviaTestCase(unittest.TestCase):
         res = self.client().post('quizzes')
         self.assertEqual(res.status_code, 422)
 
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions',
+                                 json={"quiz_category": {"id": 2}})
+        data = res.json
+        self.assertEqual(res.status_code, 201)
+
+        seen = []
+        while data["question"] is not None:
+            self.assertEqual(data["question"]["category"], 2)
+            seen.append(data["question"]["id"])
+            data = self.client().post('/quizzes/sessions/{}/next'.format(
+                res.json["session_token"])).json
+        self.assertGreater(len(seen), 0)
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_quiz_session_for_all_categories(self):
+        res = self.client().post('/quizzes/sessions',
+                                 json={"quiz_category": {"id": 0}})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json["remaining_questions"],
+                         Question.query.count() - 1)
+
+    def test_quiz_session_with_unknown_category(self):
+        res = self.client().post('/quizzes/sessions',
+                                 json={"quiz_category": {"id": 99}})
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(res.json["success"])
+
+    def test_quiz_session_not_found(self):
+        res = self.client().post('/quizzes/sessions/nope/next')
+        self.assertEqual(res.status_code, 404)
+
     def test_address_not_found(self):
         res = self.client().delete('/questionssss')
         self.assertEqual(res.status_code, 404)
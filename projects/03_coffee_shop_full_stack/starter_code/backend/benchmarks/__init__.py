@@ -0,0 +1,4 @@
+'''A local RS256 token issuer and benchmarks of requires_auth.
+
+Run `python -m benchmarks --help` from the backend directory.
+'''
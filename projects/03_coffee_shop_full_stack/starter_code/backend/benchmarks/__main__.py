@@ -0,0 +1,82 @@
+import argparse
+import json
+import subprocess
+import sys
+
+from src.auth import auth
+from .issuer import KEY_SIZE, TokenIssuer
+from .load import PERMISSION, SCENARIOS, installed, make_app, run
+
+
+# Copied from the trivia backend's benchmarks/__main__.py; test_auth.py
+# fails if they drift.
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Mint tokens with a local RS256 issuer and report the '
+                    'throughput of requests through requires_auth.')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='requests per scenario (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='concurrent clients (default: %(default)s)')
+    parser.add_argument('--tokens', type=int, default=100,
+                        help='distinct tokens the clients send '
+                             '(default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='untimed requests per scenario '
+                             '(default: %(default)s)')
+    parser.add_argument('--key-size', type=int, default=KEY_SIZE,
+                        help='RSA key size in bits (default: %(default)s)')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='run only this scenario; may be repeated')
+    parser.add_argument('--output', help='write the JSON report here too')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    issuer = TokenIssuer('https://' + auth.AUTH0_DOMAIN + '/',
+                         auth.API_AUDIENCE, key_size=args.key_size)
+    tokens = [issuer.mint([PERMISSION]) for _ in range(args.tokens)]
+    app = make_app()
+    report = {
+        'commit': git_commit(),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'tokens': args.tokens,
+            'warmup': args.warmup,
+            'key_size': args.key_size,
+        },
+        'results': {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        with issuer.serve() as server:
+            jwks, token_cache = SCENARIOS[name](server.url)
+            with installed(jwks, token_cache):
+                result = run(app, tokens, args.requests, args.concurrency,
+                             args.warmup)
+            result['jwks_fetches'] = server.hits
+            hit_rate = token_cache.stats()['hit_rate']
+            result['token_cache_hit_rate'] = \
+                None if hit_rate is None else round(hit_rate, 3)
+        report['results'][name] = result
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
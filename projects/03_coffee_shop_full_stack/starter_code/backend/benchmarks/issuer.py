@@ -0,0 +1,123 @@
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+ALGORITHM = 'RS256'
+KEY_SIZE = 2048
+
+
+def b64url_uint(value):
+    '''Base64url encoding of an unsigned integer, as JWK n and e use.'''
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+class TokenIssuer:
+    '''Signs RS256 tokens the way an Auth0 tenant would, for tests and
+    benchmarks only.
+
+    Holds one or more RSA keypairs; tokens are signed with the newest.
+    `jwks()` is the public half, as /.well-known/jwks.json serves it,
+    and `serve()` serves it from localhost.
+    '''
+
+    def __init__(self, issuer, audience, key_size=KEY_SIZE):
+        self.issuer = issuer
+        self.audience = audience
+        self.key_size = key_size
+        self.keys = []
+        self.rotate()
+
+    def rotate(self):
+        '''Add a new keypair and sign with it from now on; return its kid.'''
+        kid = uuid.uuid4().hex
+        self.keys.append((kid, RSA.generate(self.key_size)))
+        return kid
+
+    @property
+    def kid(self):
+        return self.keys[-1][0]
+
+    def jwks(self):
+        return {'keys': [
+            {
+                'kty': 'RSA',
+                'kid': kid,
+                'use': 'sig',
+                'alg': ALGORITHM,
+                'n': b64url_uint(key.n),
+                'e': b64url_uint(key.e),
+            }
+            for kid, key in self.keys
+        ]}
+
+    def mint(self, permissions=(), expires_in=3600, kid=None, **claims):
+        '''A signed token granting `permissions`.
+
+        iss, aud, iat and exp are filled in unless given in `claims`;
+        a negative `expires_in` makes an expired token. `kid` picks the
+        signing key (the newest by default) and need not exist.
+        '''
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'aud': self.audience,
+            'sub': 'auth0|{}'.format(uuid.uuid4().hex[:24]),
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions),
+        }
+        payload.update(claims)
+        kid = kid or self.kid
+        key = dict(self.keys).get(kid, self.keys[-1][1])
+        return jwt.encode(payload, key.export_key('PEM').decode(),
+                          algorithm=ALGORITHM, headers={'kid': kid})
+
+    def serve(self, cache_control='max-age=600'):
+        return JWKSServer(self, cache_control)
+
+
+class JWKSServer:
+    '''Serves an issuer's JWKS on localhost, in a thread, counting hits.'''
+
+    def __init__(self, issuer, cache_control='max-age=600',
+                 host='127.0.0.1', port=0):
+        self.issuer = issuer
+        self.cache_control = cache_control
+        self.hits = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits += 1
+                body = json.dumps(server.issuer.jwks()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                if server.cache_control:
+                    self.send_header('Cache-Control', server.cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = 'http://{}:{}/.well-known/jwks.json'.format(
+            host, self.server.server_port)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
@@ -0,0 +1,154 @@
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flask import Flask
+
+from src.auth import auth
+from src.auth.jwks import JWKSKeyStore, fetch_jwks
+from src.auth.tokens import TokenCache
+
+PERMISSION = 'get:drinks-detail'
+
+
+def make_app(permission=PERMISSION):
+    '''A bare app with one route behind requires_auth(permission).'''
+    app = Flask(__name__)
+
+    @app.route('/protected')
+    @auth.requires_auth(permission)
+    def protected(payload):
+        return 'ok'
+
+    @app.errorhandler(auth.AuthError)
+    def auth_error(error):
+        return error.error['code'], error.status_code
+
+    return app
+
+
+class UncachedKeyStore:
+    '''Fetches the JWKS for every lookup, as verify_decode_jwt did before
+    JWKSKeyStore; unlike it, concurrent lookups never share a fetch.'''
+
+    def __init__(self, url):
+        self.url = url
+
+    def get(self, kid):
+        keys, _ = fetch_jwks(self.url)
+        return keys.get(kid)
+
+
+def cold_keys(url):
+    '''The keys are fetched for every request; every token is verified.'''
+    return UncachedKeyStore(url), TokenCache(max_size=0)
+
+
+def warm_keys(url):
+    '''The keys are cached; every token is verified.'''
+    return JWKSKeyStore(url), TokenCache(max_size=0)
+
+
+def cached_tokens(url):
+    '''The keys and the verified tokens are cached.'''
+    return JWKSKeyStore(url), TokenCache()
+
+
+SCENARIOS = {
+    'cold_keys': cold_keys,
+    'warm_keys': warm_keys,
+    'cached_tokens': cached_tokens,
+}
+
+
+@contextmanager
+def installed(jwks, token_cache):
+    '''Swap the auth module's key store and token cache for the block.'''
+    saved = auth.jwks, auth.token_cache
+    auth.jwks, auth.token_cache = jwks, token_cache
+    try:
+        yield
+    finally:
+        auth.jwks, auth.token_cache = saved
+
+
+# Copied from the trivia backend's benchmarks/load.py, which holds the
+# canonical versions of percentile, summarize and _ms; test_auth.py fails
+# if they drift.
+def percentile(values, fraction):
+    '''Nearest-rank percentile of sorted `values`.'''
+    if not values:
+        return None
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    '''Latency percentiles (milliseconds) and throughput of one run.'''
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1) if elapsed else None,
+        'mean_ms': round(1000 * sum(latencies) / count, 3) if count else None,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(1000 * seconds, 3)
+
+
+def run(app, tokens, requests, concurrency, warmup=0, seed=0):
+    '''GET /protected `requests` times from `concurrency` threads, each
+    time with a random token of `tokens`, and summarize.
+
+    Any response but a 200 counts as an error.
+    '''
+    local = threading.local()
+
+    def send(token):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.get('/protected', headers={
+            'Authorization': 'Bearer ' + token}).status_code
+
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        send(rng.choice(tokens))
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random('{}-{}'.format(seed, index))
+        share = requests // concurrency + (index < requests % concurrency)
+        timings, failed = [], 0
+        for _ in range(share):
+            token = rng.choice(tokens)
+            start = time.perf_counter()
+            try:
+                status = send(token)
+            except Exception:
+                status = None
+            timings.append(time.perf_counter() - start)
+            if status != 200:
+                failed += 1
+        with lock:
+            latencies.extend(timings)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
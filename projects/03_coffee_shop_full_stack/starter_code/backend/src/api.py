@@ -1,15 +1,23 @@
 import os
-from flask import Flask, request, jsonify, abort
+import time
+from threading import Lock
+from flask import Flask, request, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import (
+    db, db_drop_and_create_all, setup_db, Drink, long_rows, short_rows)
 from .auth.auth import AuthError, requires_auth
+from .json_provider import JSONProvider
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+provider = JSONProvider(app)
+
+# Seconds another worker's writes may go unseen by this one's GET /drinks.
+DRINKS_CACHE_TTL = int(os.environ.get('DRINKS_CACHE_TTL', 30))
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -20,59 +28,187 @@ CORS(app)
 
 ## ROUTES
 '''
-@TODO implement endpoint
-    GET /drinks
-        it should be a public endpoint
-        it should contain only the drink.short() data representation
-    returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
-        or appropriate status code indicating reason for failure
+the GET /drinks response body, serialized once and served until a write
+endpoint calls invalidate() or `ttl` seconds have passed
+the cache is per process: the TTL bounds how long writes handled by other
+workers go unseen; 0 turns the cache off
+a body computed while a write is committed is dropped, not stored
 '''
+class CachedBody:
+    def __init__(self, compute, ttl=DRINKS_CACHE_TTL, clock=time.monotonic):
+        self.compute = compute
+        self.ttl = ttl
+        self.clock = clock
+        self.body = None
+        self.expires_at = 0
+        self.generation = 0
+        self.lock = Lock()
+
+    def get(self):
+        body = self.body
+        if body is None or self.clock() >= self.expires_at:
+            generation = self.generation
+            body = self.compute()
+            with self.lock:
+                if generation == self.generation:
+                    self.body = body
+                    self.expires_at = self.clock() + self.ttl
+        return body
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.body = None
+
+
+def drink_rows():
+    return db.session.query(Drink.id, Drink.title, Drink.recipe).order_by(
+        Drink.id)
+
+
+def load_drinks_body():
+    return provider.dumps({
+        'success': True,
+        'drinks': short_rows(drink_rows())
+    })
+
+
+drinks_body = CachedBody(load_drinks_body)
 
 
 '''
-@TODO implement endpoint
-    GET /drinks-detail
-        it should require the 'get:drinks-detail' permission
-        it should contain the drink.long() data representation
-    returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
-        or appropriate status code indicating reason for failure
+read_recipe(body)
+    the recipe of a POST or PATCH body as a json blob, or abort(422)
+    a single ingredient may be sent on its own instead of in a list
+    a blob longer than the recipe column is rejected too
 '''
+def read_recipe(body):
+    recipe = body.get('recipe')
+    if isinstance(recipe, dict):
+        recipe = [recipe]
+    if not isinstance(recipe, list) or not recipe:
+        abort(422)
+    for ingredient in recipe:
+        if not isinstance(ingredient, dict) or \
+                not isinstance(ingredient.get('name'), str) or \
+                not isinstance(ingredient.get('color'), str) or \
+                not isinstance(ingredient.get('parts'), (int, float)):
+            abort(422)
+    recipe = json.dumps(recipe)
+    if len(recipe) > Drink.__table__.c.recipe.type.length:
+        abort(422)
+    return recipe
+
+
+def read_title(body):
+    title = body.get('title')
+    if not isinstance(title, str) or not title.strip() or \
+            len(title.strip()) > Drink.__table__.c.title.type.length:
+        abort(422)
+    return title.strip()
+
+
+'''
+commit_drink(write)
+    runs drink.insert, update or delete and invalidates drinks_body
+    aborts with 422 if the title is already taken
+'''
+def commit_drink(write):
+    try:
+        write()
+    except exc.IntegrityError:
+        db.session.rollback()
+        abort(422)
+    drinks_body.invalidate()
 
 
 '''
-@TODO implement endpoint
-    POST /drinks
-        it should create a new row in the drinks table
-        it should require the 'post:drinks' permission
-        it should contain the drink.long() data representation
-    returns status code 200 and json {"success": True, "drinks": drink} where drink an array containing only the newly created drink
-        or appropriate status code indicating reason for failure
+GET /drinks
+    public, the drink.short() data representation of every drink
+    served from drinks_body, so no recipe is parsed per request
 '''
+@app.route('/drinks')
+def get_drinks():
+    return app.response_class(drinks_body.get(),
+                              mimetype=provider.mimetype)
 
 
 '''
-@TODO implement endpoint
-    PATCH /drinks/<id>
-        where <id> is the existing model id
-        it should respond with a 404 error if <id> is not found
-        it should update the corresponding row for <id>
-        it should require the 'patch:drinks' permission
-        it should contain the drink.long() data representation
-    returns status code 200 and json {"success": True, "drinks": drink} where drink an array containing only the updated drink
-        or appropriate status code indicating reason for failure
+GET /drinks-detail
+    requires the 'get:drinks-detail' permission
+    the drink.long() data representation of every drink
 '''
+@app.route('/drinks-detail')
+@requires_auth('get:drinks-detail')
+def get_drinks_detail(payload):
+    return provider.response({
+        'success': True,
+        'drinks': long_rows(drink_rows())
+    })
 
 
 '''
-@TODO implement endpoint
-    DELETE /drinks/<id>
-        where <id> is the existing model id
-        it should respond with a 404 error if <id> is not found
-        it should delete the corresponding row for <id>
-        it should require the 'delete:drinks' permission
-    returns status code 200 and json {"success": True, "delete": id} where id is the id of the deleted record
-        or appropriate status code indicating reason for failure
+POST /drinks
+    requires the 'post:drinks' permission
+    creates a drink from {"title", "recipe"}
+    returns the drink.long() data representation of the new drink
 '''
+@app.route('/drinks', methods=['POST'])
+@requires_auth('post:drinks')
+def create_drink(payload):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400)
+    drink = Drink(title=read_title(body), recipe=read_recipe(body))
+    commit_drink(drink.insert)
+    return provider.response({
+        'success': True,
+        'drinks': [drink.long()]
+    })
+
+
+'''
+PATCH /drinks/<id>
+    requires the 'patch:drinks' permission
+    updates the title and/or the recipe of the drink
+    returns the drink.long() data representation of the updated drink
+'''
+@app.route('/drinks/<int:id>', methods=['PATCH'])
+@requires_auth('patch:drinks')
+def update_drink(payload, id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400)
+    drink = Drink.query.get(id)
+    if drink is None:
+        abort(404)
+    if 'title' in body:
+        drink.title = read_title(body)
+    if 'recipe' in body:
+        drink.recipe = read_recipe(body)
+    commit_drink(drink.update)
+    return provider.response({
+        'success': True,
+        'drinks': [drink.long()]
+    })
+
+
+'''
+DELETE /drinks/<id>
+    requires the 'delete:drinks' permission
+    returns the id of the deleted drink
+'''
+@app.route('/drinks/<int:id>', methods=['DELETE'])
+@requires_auth('delete:drinks')
+def delete_drink(payload, id):
+    drink = Drink.query.get(id)
+    if drink is None:
+        abort(404)
+    commit_drink(drink.delete)
+    return provider.response({
+        'success': True,
+        'delete': id
+    })
 
 
 ## Error Handling
@@ -81,30 +217,40 @@ Example error handling for unprocessable entity
 '''
 @app.errorhandler(422)
 def unprocessable(error):
-    return jsonify({
+    return provider.response({
                     "success": False, 
                     "error": 422,
                     "message": "unprocessable"
                     }), 422
 
-'''
-@TODO implement error handlers using the @app.errorhandler(error) decorator
-    each error handler should return (with approprate messages):
-             jsonify({
-                    "success": False, 
+@app.errorhandler(400)
+def bad_request(error):
+    return provider.response({
+                    "success": False,
+                    "error": 400,
+                    "message": "bad request"
+                    }), 400
+
+@app.errorhandler(404)
+def not_found(error):
+    return provider.response({
+                    "success": False,
                     "error": 404,
                     "message": "resource not found"
                     }), 404
 
-'''
-
-'''
-@TODO implement error handler for 404
-    error handler should conform to general task above 
-'''
-
+@app.errorhandler(405)
+def method_not_allowed(error):
+    return provider.response({
+                    "success": False,
+                    "error": 405,
+                    "message": "method not allowed"
+                    }), 405
 
-'''
-@TODO implement error handler for AuthError
-    error handler should conform to general task above 
-'''
+@app.errorhandler(AuthError)
+def auth_error(error):
+    return provider.response({
+                    "success": False,
+                    "error": error.status_code,
+                    "message": error.error['description']
+                    }), error.status_code
@@ -1,14 +1,33 @@
 import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSKeyStore
+from .permissions import (
+    all_of, any_of, compile_permissions, granted_permissions)
+from .tokens import MAX_CACHED_TOKENS, TOKEN_CACHE_TTL, TokenCache
 
 
 AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'dev'
 
+'''
+Signing keys of the Auth0 tenant, fetched once and refreshed
+in the background as their Cache-Control max-age runs out
+'''
+jwks = JWKSKeyStore(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+
+'''
+Payloads of tokens that were already verified, so that repeat callers
+skip the signature check; set TOKEN_CACHE_SIZE=0 to turn it off
+'''
+token_cache = TokenCache(
+    max_size=int(os.environ.get('TOKEN_CACHE_SIZE', MAX_CACHED_TOKENS)),
+    ttl=int(os.environ.get('TOKEN_CACHE_TTL', TOKEN_CACHE_TTL)))
+
 ## AuthError Exception
 '''
 AuthError Exception
@@ -23,63 +42,157 @@ class AuthError(Exception):
 ## Auth Header
 
 '''
-@TODO implement get_token_auth_header() method
-    it should attempt to get the header from the request
-        it should raise an AuthError if no header is present
-    it should attempt to split bearer and the token
-        it should raise an AuthError if the header is malformed
-    return the token part of the header
+get_token_auth_header()
+    gets the token part of the 'Authorization: Bearer <token>' header
+    raises an AuthError if the header is missing or malformed
 '''
 def get_token_auth_header():
-   raise Exception('Not Implemented')
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if not parts or parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    return parts[1]
 
 '''
-@TODO implement check_permissions(permission, payload) method
+check_permissions(permission, payload)
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink'), any_of(...),
+            all_of(...) or a Requirement from compile_permissions
         payload: decoded jwt payload
+        granted: the payload's permissions as a frozenset, if known
 
-    it should raise an AuthError if permissions are not included in the payload
+    raises an AuthError if the payload has no permissions array
         !!NOTE check your RBAC settings in Auth0
-    it should raise an AuthError if the requested permission string is not in the payload permissions array
-    return true otherwise
+    raises an AuthError if the granted permissions do not satisfy it
+    returns true otherwise
 '''
-def check_permissions(permission, payload):
-    raise Exception('Not Implemented')
+def check_permissions(permission, payload, granted=None):
+    if granted is None:
+        granted = granted_permissions(payload)
+    if granted is None:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if not compile_permissions(permission).satisfied_by(granted):
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission not found.'
+        }, 403)
+    return True
 
 '''
-@TODO implement verify_decode_jwt(token) method
+verify_decode_jwt(token)
     @INPUTS
         token: a json web token (string)
 
-    it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
-    it should decode the payload from the token
-    it should validate the claims
-    return the decoded payload
-
-    !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
+    verifies an Auth0 token with the key its kid names in the tenant's
+    /.well-known/jwks.json, which `jwks` keeps cached between requests
+    validates the claims and returns the decoded payload
 '''
 def verify_decode_jwt(token):
-    raise Exception('Not Implemented')
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
+    if 'kid' not in unverified_header:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+
+    try:
+        key = jwks.get(unverified_header['kid'])
+    except (OSError, ValueError, KeyError):
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 503)
+    if key is None:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to find the appropriate key.'
+        }, 400)
+
+    try:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=ALGORITHMS,
+            audience=API_AUDIENCE,
+            issuer='https://' + AUTH0_DOMAIN + '/'
+        )
+
+    except jwt.ExpiredSignatureError:
+        raise AuthError({
+            'code': 'token_expired',
+            'description': 'Token expired.'
+        }, 401)
+
+    except jwt.JWTClaimsError:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Incorrect claims. Please, check the audience and issuer.'
+        }, 401)
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
 
 '''
-@TODO implement @requires_auth(permission) decorator method
+@requires_auth(permission) decorator method
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
+        permission: string permission (i.e. 'post:drink'),
+            or any_of(...) / all_of(...) of them; wildcards are
+            allowed in the token's scopes (i.e. '*:drinks')
 
-    it should use the get_token_auth_header method to get the token
-    it should use the verify_decode_jwt method to decode the jwt
-    it should use the check_permissions method validate claims and check the requested permission
-    return the decorator which passes the decoded payload to the decorated method
+    compiles the permission once, when the route is declared
+    gets the token with get_token_auth_header, decodes it with
+    verify_decode_jwt unless token_cache already has its payload and
+    granted permissions, and checks them with check_permissions
+    passes the decoded payload to the decorated method
 '''
 def requires_auth(permission=''):
+    requirement = compile_permissions(permission)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            verified = token_cache.get(token)
+            if verified is None:
+                payload = verify_decode_jwt(token)
+                verified = payload, granted_permissions(payload)
+                token_cache.put(token, verified, payload.get('exp'))
+            payload, granted = verified
+            check_permissions(requirement, payload, granted)
             return f(payload, *args, **kwargs)
 
         return wrapper
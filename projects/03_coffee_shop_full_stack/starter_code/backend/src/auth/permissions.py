@@ -0,0 +1,104 @@
+from itertools import product
+
+WILDCARD = '*'
+
+
+class AllOf(tuple):
+    '''Permissions that must all be granted.'''
+
+    def __new__(cls, *permissions):
+        return super().__new__(cls, permissions)
+
+    def __repr__(self):
+        return 'all_of({})'.format(', '.join(map(repr, self)))
+
+
+class AnyOf(tuple):
+    '''Permissions of which at least one must be granted.'''
+
+    def __new__(cls, *permissions):
+        return super().__new__(cls, permissions)
+
+    def __repr__(self):
+        return 'any_of({})'.format(', '.join(map(repr, self)))
+
+
+all_of = AllOf
+any_of = AnyOf
+
+
+def matching_scopes(permission):
+    '''The granted scopes that satisfy `permission`.
+
+    Any ':'-separated part of a granted scope may be a wildcard, so
+    'post:drinks' is granted by 'post:drinks', 'post:*', '*:drinks',
+    '*:*' and '*'.
+    '''
+    parts = permission.split(':')
+    scopes = {
+        ':'.join(combination)
+        for combination in product(*[(part, WILDCARD) for part in parts])
+    }
+    scopes.add(WILDCARD)
+    return frozenset(scopes)
+
+
+class Requirement:
+    '''A route's permission requirement, compiled once.
+
+    It is kept as clauses that must all hold, each a frozenset of scopes
+    of which any one will do, so checking a token's frozenset of granted
+    scopes costs a few set lookups however many it holds.
+    '''
+
+    def __init__(self, clauses, description):
+        self.clauses = tuple(clauses)
+        self.description = description
+
+    def __repr__(self):
+        return '<Requirement {}>'.format(self.description)
+
+    def satisfied_by(self, granted):
+        return all(not clause.isdisjoint(granted) for clause in self.clauses)
+
+
+def compile_permissions(permission):
+    '''Compile a permission string, AllOf, AnyOf or list of them.
+
+    A list means all of its items. An AnyOf may only hold strings; an
+    AllOf may also hold AnyOfs. '' requires no permission at all.
+    '''
+    if isinstance(permission, Requirement):
+        return permission
+    if isinstance(permission, str):
+        clauses = [matching_scopes(permission)] if permission else []
+        return Requirement(clauses, repr(permission))
+    if isinstance(permission, AnyOf):
+        return Requirement([_any_of(permission)], repr(permission))
+    if isinstance(permission, (AllOf, list)):
+        clauses = []
+        for item in permission:
+            if isinstance(item, AnyOf):
+                clauses.append(_any_of(item))
+            elif isinstance(item, str):
+                clauses.append(matching_scopes(item))
+            else:
+                raise TypeError('all_of() takes permission strings and '
+                                'any_of() groups, not {!r}'.format(item))
+        return Requirement(clauses, repr(permission))
+    raise TypeError('Unsupported permission requirement {!r}'.format(
+        permission))
+
+
+def _any_of(permissions):
+    if not permissions or not all(isinstance(p, str) for p in permissions):
+        raise TypeError('any_of() takes one or more permission strings')
+    return frozenset().union(*map(matching_scopes, permissions))
+
+
+def granted_permissions(payload):
+    '''The token's `permissions` claim as a frozenset, or None without one.'''
+    permissions = payload.get('permissions')
+    if permissions is None:
+        return None
+    return frozenset(permissions)
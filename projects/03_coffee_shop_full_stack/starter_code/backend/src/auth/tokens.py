@@ -0,0 +1,94 @@
+# Shared with BasicFlaskAuth. This file,
+# projects/03_coffee_shop_full_stack/starter_code/backend/src/auth/tokens.py,
+# is the canonical copy; BasicFlaskAuth/tokens.py must stay byte-identical
+# (the coffee shop's test_auth.py checks it).
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+MAX_CACHED_TOKENS = 10000
+TOKEN_CACHE_TTL = 5 * 60
+
+
+class TokenCache:
+    '''Decoded payloads of verified tokens, least recently used first.
+
+    Entries are keyed by the SHA-256 of the token, so the tokens
+    themselves are not kept in memory, and expire at the earlier of the
+    token's `exp` claim and `ttl` seconds after they were added. The
+    least recently used entries beyond `max_size` are dropped; a
+    `max_size` of 0 turns the cache off.
+
+    `clock` must return epoch seconds, as `exp` does.
+    '''
+
+    def __init__(self, max_size=MAX_CACHED_TOKENS, ttl=TOKEN_CACHE_TTL,
+                 clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        '''The cached value for `token`, or None.'''
+        if not self.enabled:
+            return None
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token, value, exp=None):
+        '''Cache what was decoded from a token that has just been verified;
+        `exp` is the token's exp claim.'''
+        if not self.enabled:
+            return
+        now = self.clock()
+        expires_at = now + self.ttl
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        if expires_at <= now:
+            return
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        '''Hit and miss counts since the last clear(), and the hit rate.'''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
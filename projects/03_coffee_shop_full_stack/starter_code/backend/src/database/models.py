@@ -1,11 +1,15 @@
 import os
+from functools import lru_cache
 from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+database_path = os.environ.get('DATABASE_URL', "sqlite:///{}".format(
+    os.path.join(project_dir, database_filename)))
+
+RECIPE_CACHE_SIZE = 4096
 
 db = SQLAlchemy()
 
@@ -29,6 +33,43 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+parse_recipe(recipe) and short_recipe(recipe)
+    the long and short form of a stored recipe json blob, parsed once per
+    version of the blob: a row whose recipe is unchanged is served from
+    the cache, an updated recipe is a new key and is parsed again
+    !!NOTE the results are shared between callers and must not be mutated
+'''
+@lru_cache(maxsize=RECIPE_CACHE_SIZE)
+def parse_recipe(recipe):
+    return json.loads(recipe)
+
+@lru_cache(maxsize=RECIPE_CACHE_SIZE)
+def short_recipe(recipe):
+    return [{'color': r['color'], 'parts': r['parts']}
+            for r in parse_recipe(recipe)]
+
+'''
+short_rows(rows) and long_rows(rows)
+    the short() and long() representations built straight from
+    (id, title, recipe) result tuples, without loading Drink objects
+    EXAMPLE
+        long_rows(db.session.query(Drink.id, Drink.title, Drink.recipe))
+'''
+def short_rows(rows):
+    return [{
+        'id': id,
+        'title': title,
+        'recipe': short_recipe(recipe)
+    } for id, title, recipe in rows]
+
+def long_rows(rows):
+    return [{
+        'id': id,
+        'title': title,
+        'recipe': parse_recipe(recipe)
+    } for id, title, recipe in rows]
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -47,12 +88,10 @@ class Drink(db.Model):
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': short_recipe(self.recipe)
         }
 
     '''
@@ -63,7 +102,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': parse_recipe(self.recipe)
         }
 
     '''
@@ -0,0 +1,271 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+# Before src.api binds the app to the database.
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from benchmarks.issuer import TokenIssuer
+from src import api, json_provider
+from src.auth import auth
+from src.auth.jwks import JWKSKeyStore
+from src.auth.tokens import TokenCache
+from src.database import models
+from src.database.models import Drink, db, db_drop_and_create_all
+
+MANAGER = ('get:drinks-detail', 'post:drinks', 'patch:drinks',
+           'delete:drinks')
+BARISTA = ('get:drinks-detail',)
+RECIPE = [{'name': 'Water', 'color': 'blue', 'parts': 1}]
+# The trivia backend holds the canonical copy of src/json_provider.py.
+CANONICAL_JSON_PROVIDER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..',
+    '02_trivia_api', 'starter', 'backend', 'flaskr', 'json_provider.py')
+
+
+def setUpModule():
+    global issuer, jwks_server
+    issuer = TokenIssuer('https://' + auth.AUTH0_DOMAIN + '/',
+                         auth.API_AUDIENCE)
+    jwks_server = issuer.serve()
+    jwks_server.__enter__()
+
+
+def tearDownModule():
+    jwks_server.__exit__(None, None, None)
+
+
+class CachedBodyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.computed = 0
+
+        def compute():
+            self.computed += 1
+            return str(self.computed).encode()
+
+        self.body = api.CachedBody(compute, ttl=30, clock=lambda: self.now)
+
+    def test_recomputes_after_ttl(self):
+        self.assertEqual(self.body.get(), b'1')
+        self.now = 29
+        self.assertEqual(self.body.get(), b'1')
+        self.now = 30
+        self.assertEqual(self.body.get(), b'2')
+
+    def test_invalidate_recomputes_straight_away(self):
+        self.body.get()
+        self.body.invalidate()
+        self.assertEqual(self.body.get(), b'2')
+
+    def test_zero_ttl_turns_the_cache_off(self):
+        self.body.ttl = 0
+        self.body.get()
+        self.assertEqual(self.body.get(), b'2')
+
+
+class JSONProviderTestCase(unittest.TestCase):
+
+    def test_registered_as_an_extension(self):
+        self.assertIs(api.app.extensions['json_provider'], api.provider)
+        self.assertIsNot(getattr(api.app, 'json', None), api.provider)
+
+    @unittest.skipUnless(os.path.exists(CANONICAL_JSON_PROVIDER),
+                         'trivia backend not checked out')
+    def test_matches_the_canonical_copy(self):
+        with open(CANONICAL_JSON_PROVIDER, 'rb') as canonical, \
+                open(json_provider.__file__, 'rb') as copy:
+            self.assertEqual(copy.read(), canonical.read())
+
+
+class DrinksTestCase(unittest.TestCase):
+    """This class represents the drink endpoints test case"""
+
+    def setUp(self):
+        self.client = api.app.test_client()
+        self.patches = [
+            mock.patch.object(auth, 'jwks', JWKSKeyStore(jwks_server.url)),
+            mock.patch.object(auth, 'token_cache', TokenCache()),
+        ]
+        for patch in self.patches:
+            patch.start()
+        with api.app.app_context():
+            db_drop_and_create_all()
+            Drink(title='Water', recipe=json.dumps(RECIPE)).insert()
+        api.drinks_body.invalidate()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        with api.app.app_context():
+            db.session.remove()
+
+    def headers(self, permissions=MANAGER):
+        return {'Authorization': 'Bearer ' + issuer.mint(permissions)}
+
+    def test_get_drinks_is_public_and_short(self):
+        res = self.client.get('/drinks')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['drinks'], [
+            {'id': 1, 'title': 'Water', 'recipe': [
+                {'color': 'blue', 'parts': 1}]}
+        ])
+
+    def test_get_drinks_parses_nothing_when_cached(self):
+        self.client.get('/drinks')
+        with mock.patch.object(models.json, 'loads') as loads, \
+                mock.patch.object(api, 'short_rows') as short_rows:
+            res = self.client.get('/drinks')
+
+        self.assertEqual(res.status_code, 200)
+        loads.assert_not_called()
+        short_rows.assert_not_called()
+
+    def test_get_drinks_sees_other_workers_writes_after_ttl(self):
+        now = [0]
+        with mock.patch.object(api.drinks_body, 'clock', lambda: now[0]):
+            self.client.get('/drinks')
+            # Committed by another worker, so this one's cache is not told.
+            with api.app.app_context():
+                Drink(title='Tea', recipe=json.dumps(RECIPE)).insert()
+            cached = json.loads(self.client.get('/drinks').data)['drinks']
+            now[0] = api.drinks_body.ttl
+            fresh = json.loads(self.client.get('/drinks').data)['drinks']
+
+        self.assertEqual([d['title'] for d in cached], ['Water'])
+        self.assertEqual([d['title'] for d in fresh], ['Water', 'Tea'])
+
+    def test_get_drinks_detail(self):
+        res = self.client.get('/drinks-detail', headers=self.headers(BARISTA))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['recipe'], RECIPE)
+
+    def test_responses_go_through_the_json_provider(self):
+        with mock.patch.object(api.provider, 'dumps',
+                               wraps=api.provider.dumps) as dumps:
+            self.client.get('/drinks-detail', headers=self.headers(BARISTA))
+            self.client.delete('/drinks/1000', headers=self.headers())
+            api.drinks_body.invalidate()
+            self.client.get('/drinks')
+
+        self.assertEqual(dumps.call_count, 3)
+
+    def test_get_drinks_detail_requires_auth(self):
+        res = self.client.get('/drinks-detail')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertFalse(data['success'])
+
+    def test_get_drinks_detail_rejects_blank_header(self):
+        res = self.client.get('/drinks-detail',
+                              headers={'Authorization': '   '})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data['message'],
+                         'Authorization header must start with "Bearer".')
+
+    def test_create_drink(self):
+        self.client.get('/drinks')
+        res = self.client.post('/drinks', headers=self.headers(), json={
+            'title': 'Latte',
+            'recipe': {'name': 'Milk', 'color': 'grey', 'parts': 3},
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['title'], 'Latte')
+        self.assertEqual(data['drinks'][0]['recipe'],
+                         [{'name': 'Milk', 'color': 'grey', 'parts': 3}])
+        drinks = json.loads(self.client.get('/drinks').data)['drinks']
+        self.assertEqual([d['title'] for d in drinks], ['Water', 'Latte'])
+
+    def test_create_drink_with_taken_title(self):
+        res = self.client.post('/drinks', headers=self.headers(), json={
+            'title': 'Water', 'recipe': RECIPE})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_create_drink_with_invalid_recipe(self):
+        res = self.client.post('/drinks', headers=self.headers(), json={
+            'title': 'Mud', 'recipe': [{'name': 'Mud'}]})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_create_drink_too_long_for_its_columns(self):
+        long_recipe = [{'name': 'Water' * 40, 'color': 'blue', 'parts': 1}]
+        res = self.client.post('/drinks', headers=self.headers(), json={
+            'title': 'Flood', 'recipe': long_recipe})
+        self.assertEqual(res.status_code, 422)
+
+        res = self.client.post('/drinks', headers=self.headers(), json={
+            'title': 'L' * 81, 'recipe': RECIPE})
+        self.assertEqual(res.status_code, 422)
+
+    def test_create_drink_requires_permission(self):
+        res = self.client.post('/drinks', headers=self.headers(BARISTA),
+                               json={'title': 'Latte', 'recipe': RECIPE})
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_update_drink(self):
+        self.client.get('/drinks')
+        recipe = [{'name': 'Ice', 'color': 'white', 'parts': 2}]
+        res = self.client.patch('/drinks/1', headers=self.headers(),
+                                json={'title': 'Ice Water', 'recipe': recipe})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['drinks'][0]['title'], 'Ice Water')
+        self.assertEqual(data['drinks'][0]['recipe'], recipe)
+        drinks = json.loads(self.client.get('/drinks').data)['drinks']
+        self.assertEqual(drinks[0]['recipe'], [{'color': 'white', 'parts': 2}])
+
+    def test_update_missing_drink(self):
+        res = self.client.patch('/drinks/1000', headers=self.headers(),
+                                json={'title': 'Nothing'})
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_delete_drink(self):
+        self.client.get('/drinks')
+        res = self.client.delete('/drinks/1', headers=self.headers())
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['delete'], 1)
+        drinks = json.loads(self.client.get('/drinks').data)['drinks']
+        self.assertEqual(drinks, [])
+
+    def test_delete_missing_drink(self):
+        res = self.client.delete('/drinks/1000', headers=self.headers())
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_errors_share_one_body(self):
+        responses = [
+            self.client.delete('/drinks/1000', headers=self.headers()),
+            self.client.put('/drinks'),
+            self.client.post('/drinks', headers=self.headers(), json={
+                'title': 'Water', 'recipe': RECIPE}),
+            self.client.get('/drinks-detail'),
+        ]
+
+        for res in responses:
+            data = json.loads(res.data)
+            self.assertEqual(res.mimetype, 'application/json')
+            self.assertEqual(set(data), {'success', 'error', 'message'})
+            self.assertFalse(data['success'])
+            self.assertEqual(data['error'], res.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
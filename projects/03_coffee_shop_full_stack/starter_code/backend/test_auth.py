@@ -0,0 +1,481 @@
+import ast
+import inspect
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from flask import Flask
+
+import benchmarks.__main__
+from benchmarks import load
+from benchmarks.issuer import TokenIssuer
+from benchmarks.load import cold_keys, installed, make_app, run
+from src.auth import auth, jwks, tokens
+from src.auth.jwks import JWKSKeyStore, max_age
+from src.auth.permissions import (
+    all_of, any_of, compile_permissions, granted_permissions)
+from src.auth.tokens import TokenCache
+
+# The root of the FSND repository, for the checks on shared code.
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', '..', '..', '..')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubJWKSServer:
+    '''Serves `kids` as a JWKS document on localhost and counts the hits.'''
+
+    def __init__(self, kids=('a',), cache_control='max-age=600', delay=0):
+        self.kids = list(kids)
+        self.cache_control = cache_control
+        self.delay = delay
+        self.hits = 0
+        self.fail = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_error(503)
+                    return
+                body = json.dumps({'keys': [
+                    {'kid': kid, 'kty': 'RSA', 'use': 'sig', 'n': 'n', 'e': 'e'}
+                    for kid in stub.kids
+                ]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                if stub.cache_control:
+                    self.send_header('Cache-Control', stub.cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(
+            self.server.server_port)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class MaxAgeTestCase(unittest.TestCase):
+    def test_max_age(self):
+        self.assertEqual(max_age('public, max-age=300'), 300)
+        self.assertEqual(max_age('max-age=0'), 0)
+        self.assertEqual(max_age('no-cache'), 0)
+        self.assertIsNone(max_age('public'))
+        self.assertIsNone(max_age(None))
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def store(self, stub, **kwargs):
+        return JWKSKeyStore(stub.url, clock=self.clock, **kwargs)
+
+    def wait_for_refresh(self, store, stub, hits=2):
+        for _ in range(200):
+            if stub.hits >= hits and store._flight is None:
+                return
+            time.sleep(0.01)
+
+    def test_get_fetches_once_within_max_age(self):
+        with StubJWKSServer(kids=('a', 'b')) as stub:
+            store = self.store(stub)
+            self.assertEqual(store.get('a')['kid'], 'a')
+            self.clock.now += 599
+            self.assertEqual(store.get('b')['kid'], 'b')
+
+        self.assertEqual(stub.hits, 1)
+
+    def test_get_uses_default_max_age_without_cache_control(self):
+        with StubJWKSServer(cache_control=None) as stub:
+            store = self.store(stub, default_max_age=60)
+            store.get('a')
+            self.clock.now += 59
+            store.get('a')
+            self.assertEqual(stub.hits, 1)
+
+            self.clock.now += 1
+            store.get('a')
+            self.wait_for_refresh(store, stub)
+
+        self.assertEqual(stub.hits, 2)
+
+    def test_stale_keys_are_served_while_refreshing(self):
+        with StubJWKSServer(delay=0.2) as stub:
+            store = self.store(stub)
+            store.get('a')
+            stub.kids = ['b']
+            self.clock.now += 601
+
+            start = time.perf_counter()
+            self.assertEqual(store.get('a')['kid'], 'a')
+            self.assertLess(time.perf_counter() - start, 0.1)
+
+            self.wait_for_refresh(store, stub)
+            self.assertIsNone(store._keys.get('a'))
+            self.assertEqual(store.get('b')['kid'], 'b')
+
+        self.assertEqual(stub.hits, 2)
+
+    def test_get_blocks_once_past_the_stale_window(self):
+        with StubJWKSServer() as stub:
+            store = self.store(stub, stale_while_revalidate=60)
+            store.get('a')
+            stub.kids = ['b']
+            self.clock.now += 661
+
+            self.assertIsNone(store.get('a'))
+            self.assertEqual(store.get('b')['kid'], 'b')
+
+        self.assertEqual(stub.hits, 2)
+
+    def test_unknown_kid_refetches_once(self):
+        with StubJWKSServer(delay=0.1) as stub:
+            store = self.store(stub)
+            store.get('a')
+            stub.kids = ['a', 'rotated']
+            self.clock.now += 30
+
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    store.get('rotated')))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([key['kid'] for key in results], ['rotated'] * 8)
+        self.assertEqual(stub.hits, 2)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        with StubJWKSServer() as stub:
+            store = self.store(stub, min_refetch_interval=30)
+            store.get('a')
+            for _ in range(10):
+                self.assertIsNone(store.get('bogus'))
+            self.assertEqual(stub.hits, 1)
+
+            self.clock.now += 30
+            self.assertIsNone(store.get('bogus'))
+            self.assertIsNone(store.get('bogus'))
+
+        self.assertEqual(stub.hits, 2)
+
+    def test_failed_refresh_keeps_stale_keys(self):
+        with StubJWKSServer() as stub:
+            store = self.store(stub)
+            store.get('a')
+            stub.fail = True
+            self.clock.now += 601
+
+            self.assertEqual(store.get('a')['kid'], 'a')
+            self.wait_for_refresh(store, stub)
+            self.assertEqual(store.get('a')['kid'], 'a')
+
+        self.assertEqual(stub.hits, 2)
+
+    def test_get_raises_when_keys_were_never_fetched(self):
+        with StubJWKSServer() as stub:
+            stub.fail = True
+            store = self.store(stub)
+            with self.assertRaises(OSError):
+                store.get('a')
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TokenCache(max_size=2, ttl=60, clock=self.clock)
+
+    def test_get_returns_cached_payload(self):
+        self.cache.put('token', {'sub': 'a'})
+        self.assertEqual(self.cache.get('token'), {'sub': 'a'})
+        self.assertIsNone(self.cache.get('other'))
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.5)
+
+    def test_tokens_are_stored_hashed(self):
+        self.cache.put('token', {'sub': 'a'})
+        self.assertNotIn('token', self.cache._entries)
+
+    def test_entry_expires_after_ttl(self):
+        self.cache.put('token', {'sub': 'a'})
+        self.clock.now += 60
+        self.assertIsNone(self.cache.get('token'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_entry_expires_at_exp(self):
+        self.cache.put('token', {'sub': 'a'}, exp=self.clock.now + 10)
+        self.clock.now += 9
+        self.assertIsNotNone(self.cache.get('token'))
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get('token'))
+
+    def test_expired_token_is_not_cached(self):
+        self.cache.put('token', {'sub': 'a'}, exp=self.clock.now - 1)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put('a', {'sub': 'a'})
+        self.cache.put('b', {'sub': 'b'})
+        self.cache.get('a')
+        self.cache.put('c', {'sub': 'c'})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_zero_max_size_disables_the_cache(self):
+        cache = TokenCache(max_size=0, clock=self.clock)
+        cache.put('token', {'sub': 'a'})
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(cache.stats()['misses'], 0)
+
+
+class PermissionsTestCase(unittest.TestCase):
+    def allows(self, requirement, *granted):
+        return compile_permissions(requirement).satisfied_by(
+            frozenset(granted))
+
+    def test_single_permission(self):
+        self.assertTrue(self.allows('post:drinks', 'post:drinks'))
+        self.assertFalse(self.allows('post:drinks', 'patch:drinks'))
+
+    def test_empty_permission_requires_nothing(self):
+        self.assertTrue(self.allows(''))
+
+    def test_wildcard_scopes(self):
+        for scope in ('*:drinks', 'post:*', '*:*', '*'):
+            self.assertTrue(self.allows('post:drinks', scope), scope)
+        self.assertTrue(self.allows('drinks:post', 'drinks:*'))
+        self.assertFalse(self.allows('post:drinks', '*:coffee'))
+
+    def test_all_of(self):
+        requirement = all_of('post:drinks', 'patch:drinks')
+        self.assertTrue(
+            self.allows(requirement, 'post:drinks', 'patch:drinks'))
+        self.assertFalse(self.allows(requirement, 'post:drinks'))
+        self.assertTrue(self.allows(['post:drinks'], 'post:drinks'))
+
+    def test_any_of(self):
+        requirement = any_of('patch:drinks', 'delete:drinks')
+        self.assertTrue(self.allows(requirement, 'delete:drinks'))
+        self.assertFalse(self.allows(requirement, 'post:drinks'))
+
+    def test_all_of_any_of(self):
+        requirement = all_of('get:drinks-detail',
+                             any_of('patch:drinks', 'delete:drinks'))
+        self.assertTrue(self.allows(
+            requirement, 'get:drinks-detail', 'patch:drinks'))
+        self.assertFalse(self.allows(requirement, 'get:drinks-detail'))
+
+    def test_invalid_requirements(self):
+        for requirement in (None, any_of(), any_of(all_of('a')),
+                            all_of(all_of('a'))):
+            with self.assertRaises(TypeError):
+                compile_permissions(requirement)
+
+    def test_granted_permissions(self):
+        self.assertEqual(granted_permissions({'permissions': ['a', 'b']}),
+                         frozenset(['a', 'b']))
+        self.assertIsNone(granted_permissions({}))
+
+
+class RequiresAuthTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.payload = {'sub': 'a', 'permissions': ['get:drinks-detail']}
+        cache = TokenCache(clock=FakeClock())
+        self.patches = [
+            mock.patch.object(auth, 'token_cache', cache),
+            mock.patch.object(auth, 'verify_decode_jwt',
+                              return_value=self.payload),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def call(self, view, token='token'):
+        headers = {'Authorization': 'Bearer ' + token}
+        with self.app.test_request_context(headers=headers):
+            return view()
+
+    def test_repeat_token_is_verified_once(self):
+        view = auth.requires_auth('get:drinks-detail')(lambda payload: payload)
+        for _ in range(3):
+            self.assertEqual(self.call(view), self.payload)
+
+        auth.verify_decode_jwt.assert_called_once_with('token')
+        self.assertEqual(auth.token_cache.stats()['hits'], 2)
+
+    def test_token_without_permissions_claim(self):
+        auth.verify_decode_jwt.return_value = {'sub': 'a'}
+        view = auth.requires_auth('get:drinks-detail')(lambda p: p)
+        with self.assertRaises(auth.AuthError) as raised:
+            self.call(view)
+
+        self.assertEqual(raised.exception.status_code, 400)
+
+    def test_cached_payload_is_still_checked_for_permission(self):
+        self.call(auth.requires_auth('get:drinks-detail')(lambda p: p))
+        view = auth.requires_auth('post:drinks')(lambda payload: payload)
+        with self.assertRaises(auth.AuthError) as raised:
+            self.call(view)
+
+        self.assertEqual(raised.exception.status_code, 403)
+        auth.verify_decode_jwt.assert_called_once_with('token')
+
+
+class VerifyDecodeJWTTestCase(unittest.TestCase):
+    '''verify_decode_jwt against tokens from a local issuer.'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = TokenIssuer('https://' + auth.AUTH0_DOMAIN + '/',
+                                 auth.API_AUDIENCE)
+
+    def setUp(self):
+        self.server = self.issuer.serve()
+        self.server.__enter__()
+        self.jwks = JWKSKeyStore(self.server.url, min_refetch_interval=0)
+        self.patch = mock.patch.object(auth, 'jwks', self.jwks)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.server.__exit__(None, None, None)
+
+    def assertRejected(self, token, code, status_code):
+        with self.assertRaises(auth.AuthError) as raised:
+            auth.verify_decode_jwt(token)
+        self.assertEqual(raised.exception.error['code'], code)
+        self.assertEqual(raised.exception.status_code, status_code)
+
+    def test_valid_token(self):
+        payload = auth.verify_decode_jwt(self.issuer.mint(['post:drinks']))
+        self.assertEqual(payload['permissions'], ['post:drinks'])
+
+    def test_expired_token(self):
+        self.assertRejected(self.issuer.mint(expires_in=-60),
+                            'token_expired', 401)
+
+    def test_wrong_audience(self):
+        self.assertRejected(self.issuer.mint(aud='other'),
+                            'invalid_claims', 401)
+
+    def test_unknown_kid(self):
+        self.assertRejected(self.issuer.mint(kid='unknown'),
+                            'invalid_header', 400)
+
+    def test_tampered_token(self):
+        header, payload, signature = self.issuer.mint().split('.')
+        forged = self.issuer.mint(['delete:drinks']).split('.')[1]
+        self.assertRejected('.'.join([header, forged, signature]),
+                            'invalid_header', 400)
+
+    def test_rotated_key_is_fetched(self):
+        auth.verify_decode_jwt(self.issuer.mint())
+        self.issuer.rotate()
+        try:
+            auth.verify_decode_jwt(self.issuer.mint())
+        finally:
+            del self.issuer.keys[-1]
+        self.assertEqual(self.server.hits, 2)
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def test_run_through_requires_auth(self):
+        issuer = TokenIssuer('https://' + auth.AUTH0_DOMAIN + '/',
+                             auth.API_AUDIENCE)
+        tokens = [issuer.mint(['get:drinks-detail']) for _ in range(3)]
+        with issuer.serve() as server, \
+                installed(JWKSKeyStore(server.url), TokenCache()):
+            result = run(make_app(), tokens, requests=20, concurrency=2)
+            stats = auth.token_cache.stats()
+
+        self.assertEqual(result['requests'], 20)
+        self.assertEqual(result['errors'], 0)
+        # Both threads may miss on the same token before either caches it.
+        self.assertEqual(stats['size'], 3)
+        self.assertLessEqual(stats['misses'], 6)
+        self.assertEqual(server.hits, 1)
+
+    def test_cold_keys_fetch_for_every_request(self):
+        issuer = TokenIssuer('https://' + auth.AUTH0_DOMAIN + '/',
+                             auth.API_AUDIENCE)
+        tokens = [issuer.mint(['get:drinks-detail']) for _ in range(3)]
+        with issuer.serve() as server, installed(*cold_keys(server.url)):
+            result = run(make_app(), tokens, requests=20, concurrency=4,
+                         warmup=2)
+
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(server.hits, 20 + 2)
+
+
+class SharedCodeTestCase(unittest.TestCase):
+    """Copies of code whose canonical version lives elsewhere in the repo"""
+
+    def path(self, *parts):
+        path = os.path.join(REPO_ROOT, *parts)
+        if not os.path.exists(path):
+            self.skipTest('{} is not checked out'.format(path))
+        return path
+
+    def test_basic_flask_auth_copies_match(self):
+        for module in (jwks, tokens):
+            copy = self.path('BasicFlaskAuth', os.path.basename(module.__file__))
+            with open(module.__file__, 'rb') as canonical, \
+                    open(copy, 'rb') as fh:
+                self.assertEqual(fh.read(), canonical.read(), copy)
+
+    def test_benchmark_helpers_match_the_trivia_backend(self):
+        trivia = ('projects', '02_trivia_api', 'starter', 'backend',
+                  'benchmarks')
+        for filename, module, names in (
+                ('load.py', load, ('percentile', 'summarize', '_ms')),
+                ('__main__.py', benchmarks.__main__, ('git_commit',))):
+            with open(self.path(*trivia, filename)) as fh:
+                source = fh.read()
+            functions = {
+                node.name: ast.get_source_segment(source, node)
+                for node in ast.parse(source).body
+                if isinstance(node, ast.FunctionDef)
+            }
+            for name in names:
+                self.assertEqual(
+                    inspect.getsource(getattr(module, name)).rstrip(),
+                    functions[name], name)
+
+
+if __name__ == "__main__":
+    unittest.main()